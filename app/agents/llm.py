@@ -0,0 +1,297 @@
+import asyncio
+import atexit
+import hashlib
+import os
+import time
+import threading
+import weakref
+import numpy as np
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+def configure_llm_cache(database_path=".lc_cache.db"):
+    """Install a process-wide LangChain cache so identical prompts skip the API
+
+    Entries never expire, so models whose answers go stale (supervisor, strategy and
+    trend agents) opt out with cache=False.
+    """
+    from langchain_core.globals import set_llm_cache
+
+    redis_url = os.getenv('REDIS_URL')
+    if redis_url and redis is None:
+        print("REDIS_URL is set but redis is not installed, using the SQLite LLM cache")
+    if redis_url and redis is not None:
+        # Shared cache so every worker process benefits from the same hits
+        from langchain_community.cache import RedisCache
+        set_llm_cache(RedisCache(redis.Redis.from_url(redis_url)))
+    else:
+        from langchain_community.cache import SQLiteCache
+        set_llm_cache(SQLiteCache(database_path=database_path))
+
+# Model behind each tier; operators can swap these without code changes
+MODEL_TIERS = {
+    'fast': os.getenv('FAST_MODEL', 'gpt-4o-mini'),
+    'reasoning': os.getenv('REASONING_MODEL', 'gpt-4o')
+}
+
+def resolve_model(agent_name, model_tier=None, default_tier='fast'):
+    """Pick the model for an agent, honoring a <AGENT>_MODEL_TIER override"""
+    tier = model_tier or os.getenv(f"{agent_name.upper()}_MODEL_TIER", default_tier)
+    return MODEL_TIERS[tier]
+
+def config_decision_ts(config):
+    """Shared decision time passed through a runnable's configurable settings"""
+    return ((config or {}).get('configurable') or {}).get('decision_ts')
+
+def config_symbol(config):
+    """Symbol under analysis passed through a runnable's configurable settings"""
+    return ((config or {}).get('configurable') or {}).get('symbol')
+
+_shared_async_http = None
+
+def _per_loop_transport():
+    """httpx transport with a separate connection pool for each running event loop
+
+    Pooled connections belong to the loop that opened them, so a caller that drives the
+    async APIs with its own asyncio.run() must not reuse connections from another loop.
+    """
+    import httpx
+
+    class PerLoopTransport(httpx.AsyncBaseTransport):
+        def __init__(self):
+            # Dropped with their loop once it is garbage collected
+            self._transports = weakref.WeakKeyDictionary()
+
+        def _transport(self):
+            loop = asyncio.get_running_loop()
+            transport = self._transports.get(loop)
+            if transport is None:
+                transport = self._transports[loop] = httpx.AsyncHTTPTransport(
+                    http2=True,
+                    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+                )
+            return transport
+
+        async def handle_async_request(self, request):
+            return await self._transport().handle_async_request(request)
+
+        async def aclose(self):
+            # Only this loop's connections can be closed from here
+            transport = self._transports.pop(asyncio.get_running_loop(), None)
+            if transport is not None:
+                await transport.aclose()
+
+    return PerLoopTransport()
+
+def shared_async_http_client():
+    """One async HTTP/2 client for every ChatOpenAI, so concurrent calls on a loop share connections"""
+    global _shared_async_http
+    if _shared_async_http is None:
+        import httpx
+        _shared_async_http = httpx.AsyncClient(transport=_per_loop_transport(), timeout=60)
+        atexit.register(lambda: run_sync(_shared_async_http.aclose()))
+    return _shared_async_http
+
+_shared_http = None
+
+def shared_http_client():
+    """Sync counterpart of shared_async_http_client for the blocking invoke paths"""
+    global _shared_http
+    if _shared_http is None:
+        import httpx
+        _shared_http = httpx.Client(
+            http2=True,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+            timeout=60
+        )
+        atexit.register(_shared_http.close)
+    return _shared_http
+
+_chat_models = {}
+_chat_models_lock = threading.Lock()
+
+def get_chat_model(model, **kwargs):
+    """One ChatOpenAI per (model, settings), shared by every agent that asks for it"""
+    key = (model, tuple(sorted(kwargs.items())))
+    with _chat_models_lock:
+        if key not in _chat_models:
+            from langchain_openai import ChatOpenAI
+            _chat_models[key] = ChatOpenAI(
+                model=model,
+                http_client=shared_http_client(),
+                http_async_client=shared_async_http_client(),
+                **kwargs
+            )
+        return _chat_models[key]
+
+_background_loop = None
+_background_lock = threading.Lock()
+
+def run_sync(coro):
+    """Run a coroutine from sync code on one long-lived event loop
+
+    asyncio.run would start a fresh loop per call, orphaning the pooled connections
+    of the shared async HTTP client; a single background loop keeps them usable.
+    """
+    global _background_loop
+    with _background_lock:
+        if _background_loop is None:
+            _background_loop = asyncio.new_event_loop()
+            threading.Thread(target=_background_loop.run_forever, name='llm-loop', daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop).result()
+
+def iter_sync(agen):
+    """Drive an async generator from sync code on the background loop, one item at a time"""
+    while True:
+        try:
+            yield run_sync(agen.__anext__())
+        except StopAsyncIteration:
+            return
+
+class SemanticCache:
+    """Reuse answers for repeated prompts: exact hash match first, then embedding cosine similarity"""
+
+    def __init__(self, threshold=0.98, ttl=None, embeddings=None):
+        self.threshold = threshold
+        # Seconds an answer stays valid; None keeps it for the life of the process
+        self.ttl = ttl
+        self._embeddings = embeddings
+        # (namespace, blake2b digest) -> (response, expires_at)
+        self._exact = {}
+        # namespace -> (unit vectors stacked row-wise, expiry per row, cached responses)
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @property
+    def embeddings(self):
+        if self._embeddings is None:
+            from langchain_openai import OpenAIEmbeddings
+            self._embeddings = OpenAIEmbeddings(
+                model=os.getenv('EMBEDDING_MODEL', 'text-embedding-3-small'),
+                http_async_client=shared_async_http_client()
+            )
+        return self._embeddings
+
+    def get_or_call(self, namespace, text, call, semantic=True):
+        """semantic=False limits reuse to byte-identical prompts"""
+        key = self._exact_key(namespace, text)
+        hit = self._get_exact(key)
+        if hit is not None:
+            return hit
+        if not semantic:
+            response = call()
+            self._add(namespace, key, None, response)
+            return response
+        vector = self._normalize(self.embeddings.embed_query(text))
+        hit = self._search(namespace, vector)
+        if hit is not None:
+            return hit
+        response = call()
+        self._add(namespace, key, vector, response)
+        return response
+
+    async def aget_or_call(self, namespace, text, acall, semantic=True):
+        key = self._exact_key(namespace, text)
+        hit = self._get_exact(key)
+        if hit is not None:
+            return hit
+        if not semantic:
+            response = await acall()
+            self._add(namespace, key, None, response)
+            return response
+        vector = self._normalize(await self.embeddings.aembed_query(text))
+        hit = self._search(namespace, vector)
+        if hit is not None:
+            return hit
+        response = await acall()
+        self._add(namespace, key, vector, response)
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._exact.clear()
+            self._entries.clear()
+
+    def _exact_key(self, namespace, text):
+        return namespace, hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+    def _get_exact(self, key):
+        entry = self._exact.get(key)
+        if entry is None or entry[1] < time.monotonic():
+            return None
+        return entry[0]
+
+    def _normalize(self, embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _search(self, namespace, vector):
+        entry = self._entries.get(namespace)
+        if entry is None:
+            return None
+        vectors, expires, responses = entry
+        # Rows are unit length, so the dot product is the cosine similarity
+        scores = np.where(expires >= time.monotonic(), vectors @ vector, -1.0)
+        best = int(scores.argmax())
+        return responses[best] if scores[best] >= self.threshold else None
+
+    def _add(self, namespace, key, vector, response):
+        now = time.monotonic()
+        expires_at = now + self.ttl if self.ttl is not None else float('inf')
+        with self._lock:
+            self._exact = {k: v for k, v in self._exact.items() if v[1] >= now}
+            self._exact[key] = (response, expires_at)
+            if vector is None:
+                return
+            vectors, expires, responses = self._entries.get(
+                namespace, (np.empty((0, vector.size), dtype=np.float32), np.empty(0), [])
+            )
+            # Drop expired rows while we hold the lock so the index doesn't grow without bound
+            live = expires >= now
+            self._entries[namespace] = (
+                np.vstack([vectors[live], vector]),
+                np.append(expires[live], expires_at),
+                [response for response, keep in zip(responses, live) if keep] + [response]
+            )
+
+_shared_semantic_cache = None
+
+def shared_semantic_cache():
+    """Process-wide semantic cache shared by every agent"""
+    global _shared_semantic_cache
+    if _shared_semantic_cache is None:
+        ttl = os.getenv('SEMANTIC_CACHE_TTL', '300')
+        _shared_semantic_cache = SemanticCache(
+            float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.98')),
+            ttl=float(ttl) if ttl else None
+        )
+    return _shared_semantic_cache
+
+_rate_limiter = None
+
+def rate_limiter():
+    """Token bucket shared by every agent so concurrent calls stay under the provider's RPM"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        from aiolimiter import AsyncLimiter
+        _rate_limiter = AsyncLimiter(int(os.getenv('LLM_MAX_RPM', '500')), 60)
+    return _rate_limiter
+
+async def ainvoke_with_retry(runnable, messages):
+    """Invoke under the shared rate limit, retrying 429s and transient server errors with jittered backoff"""
+    from openai import APIConnectionError, InternalServerError, RateLimitError
+    from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+
+    async for attempt in AsyncRetrying(
+        wait=wait_exponential_jitter(1, 32),
+        retry=retry_if_exception_type((RateLimitError, InternalServerError, APIConnectionError)),
+        stop=stop_after_attempt(6),
+        reraise=True
+    ):
+        with attempt:
+            # Each attempt takes its own token so retries are rate limited too
+            async with rate_limiter():
+                return await runnable.ainvoke(messages)
@@ -1,40 +1,16 @@
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage
+from agents.llm import (
+    ainvoke_with_retry, config_decision_ts, config_symbol, get_chat_model, resolve_model, shared_semantic_cache
+)
+from langchain_core.runnables import RunnableLambda
+import hashlib
+import threading
 import pandas as pd
+from cachetools import TTLCache
+from datetime import datetime, timezone
 
-class MarketTrendAgent:
-    def __init__(self, timeframe, model="gpt-4"):
-        # Map timeframes to valid yfinance periods
-        self.timeframe_mapping = {
-            '30d': '1mo',
-            '15d': '15d',
-            '3d': '5d'
-        }
-        self.timeframe = self.timeframe_mapping.get(timeframe, '1mo')
-        self.chat_model = ChatOpenAI(model=model)
-
-    def analyze_trend(self, market_data):
-        if market_data.empty:
-            return {
-                'timeframe': self.timeframe,
-                'analysis': f"No market data available for the specified timeframe: {self.timeframe}",
-                'timestamp': pd.Timestamp.now()
-            }
-
-        system_prompt = self._get_system_prompt()
-        market_context = self._prepare_market_context(market_data)
-
-        messages = [
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=market_context)
-        ]
-
-        response = self.chat_model(messages)
-        return self._parse_response(response.content)
-
-    def _get_system_prompt(self):
-        return f"""
-        You are a market trend analysis expert focusing on {self.timeframe} trends.
+_SYSTEM_PROMPT_TEMPLATE = """
+        You are a market trend analysis expert focusing on {timeframe} trends.
         Analyze the provided market data and provide:
         1. Overall trend direction (bullish/bearish/neutral)
         2. Trend strength (0-1)
@@ -48,32 +24,156 @@ class MarketTrendAgent:
         - Volume confirmation
         - Technical indicator convergence/divergence
         - Market breadth
+
+        Market data is given as key=value pairs: tf=timeframe, p0/p1=first/last close,
+        chg=percent change, vol_avg/vol_last=average/latest volume, rsi=RSI(14), macd=MACD line.
         """
 
-    def _prepare_market_context(self, market_data):
+class MarketTrendAgent:
+    def __init__(self, timeframe, model=None, model_tier=None, semantic_cache=None):
+        # Map timeframes to valid yfinance periods
+        self.timeframe_mapping = {
+            '30d': '1mo',
+            '15d': '15d',
+            '3d': '5d'
+        }
+        self.timeframe = self.timeframe_mapping.get(timeframe, '1mo')
+        self.chat_model = get_chat_model(
+            model or resolve_model('trend', model_tier),
+            streaming=True,
+            max_tokens=512,
+            # Answers are reused only through the TTL'd caches, never the persistent LLM cache
+            cache=False
+        )
+        # The timeframe never changes, so render the system prompt once
+        self._system_prompt = _SYSTEM_PROMPT_TEMPLATE.format(timeframe=self.timeframe)
+        self._system_message = SystemMessage(content=self._system_prompt)
+        # Consecutive refreshes of a symbol often produce identical contexts, so answer those from the cache
+        self.semantic_cache = semantic_cache or shared_semantic_cache()
+        # Reruns analyze the same bars again, so a symbol's result is reused while its data is unchanged
+        self._results = TTLCache(maxsize=256, ttl=1800)
+        self._results_lock = threading.Lock()
+        self._chain = self.as_chain()
+
+    def analyze_trend(self, market_data, decision_ts=None, symbol=None):
         if market_data.empty:
-            return "No market data available for analysis."
+            return self._empty_response(decision_ts)
 
-        return f"""
-        Market Analysis for {self.timeframe}:
+        key = self._result_key(symbol, market_data)
+        cached = self._cached_result(key, decision_ts)
+        if cached is not None:
+            return cached
 
-        Price Movement:
-        Start: {market_data['Close'].iloc[0]:.2f}
-        End: {market_data['Close'].iloc[-1]:.2f}
-        Change: {((market_data['Close'].iloc[-1] - market_data['Close'].iloc[0]) / market_data['Close'].iloc[0] * 100):.2f}%
+        return self._store_result(key, self._chain.invoke(
+            market_data, {'configurable': {'decision_ts': decision_ts, 'symbol': symbol}}
+        ))
 
-        Volume Analysis:
-        Average Volume: {market_data['Volume'].mean():.0f}
-        Latest Volume: {market_data['Volume'].iloc[-1]:.0f}
+    async def aanalyze_trend(self, market_data, decision_ts=None, symbol=None):
+        if market_data.empty:
+            return self._empty_response(decision_ts)
 
-        Technical Indicators:
-        RSI: {market_data['RSI'].iloc[-1]:.2f}
-        MACD: {market_data['MACD'].iloc[-1]:.3f}
-        """
+        key = self._result_key(symbol, market_data)
+        cached = self._cached_result(key, decision_ts)
+        if cached is not None:
+            return cached
+
+        return self._store_result(key, await self._chain.ainvoke(
+            market_data, {'configurable': {'decision_ts': decision_ts, 'symbol': symbol}}
+        ))
+
+    def _result_key(self, symbol, market_data):
+        """(symbol, timeframe, data hash), or None when the symbol is unknown and results can't be shared"""
+        if symbol is None:
+            return None
+        digest = hashlib.blake2b(pd.util.hash_pandas_object(market_data, index=True).to_numpy(), digest_size=16)
+        return symbol, self.timeframe, digest.hexdigest()
+
+    def _cached_result(self, key, decision_ts=None):
+        if key is None:
+            return None
+        with self._results_lock:
+            result = self._results.get(key)
+        if result is None:
+            return None
+        # Same analysis, stamped with this run's decision time
+        return dict(result, timestamp=decision_ts or result['timestamp'])
+
+    def _store_result(self, key, result):
+        if key is not None:
+            with self._results_lock:
+                self._results[key] = result
+        return result
+
+    def as_chain(self):
+        """Build the analysis as an LCEL runnable: market data in, trend analysis out"""
+        return (
+            RunnableLambda(self._build_messages)
+            | RunnableLambda(self._complete, afunc=self._acomplete)
+            | RunnableLambda(self._parse_response)
+        )
+
+    # The key=value context has no symbol, so the namespace carries it. Embeddings of short
+    # numeric contexts barely move when an indicator changes, so only identical contexts are reused
+    def _complete(self, messages, config=None):
+        return self.semantic_cache.get_or_call(
+            ('trend', self.timeframe, config_symbol(config)), messages[-1].content,
+            lambda: self.chat_model.invoke(messages).content,
+            semantic=False
+        )
+
+    async def _acomplete(self, messages, config=None):
+        async def acall():
+            return (await ainvoke_with_retry(self.chat_model, messages)).content
+
+        return await self.semantic_cache.aget_or_call(
+            ('trend', self.timeframe, config_symbol(config)), messages[-1].content, acall, semantic=False
+        )
+
+    def _build_messages(self, market_data):
+        return [
+            self._system_message,
+            HumanMessage(content=self._prepare_market_context(market_data))
+        ]
+
+    def _empty_response(self, decision_ts=None):
+        return {
+            'timeframe': self.timeframe,
+            'analysis': f"No market data available for the specified timeframe: {self.timeframe}",
+            'timestamp': decision_ts or datetime.now(timezone.utc)
+        }
+
+    def _get_system_prompt(self):
+        return self._system_prompt
 
-    def _parse_response(self, response):
+    def _prepare_market_context(self, market_data):
+        if market_data.empty:
+            return "No market data available for analysis."
+
+        # Work on raw numpy views to skip pandas indexing overhead
+        close = market_data['Close'].to_numpy()
+        volume = market_data['Volume'].to_numpy()
+        start, end = close[0], close[-1]
+        rsi = market_data['RSI'].to_numpy()[-1]
+        macd = market_data['MACD'].to_numpy()[-1]
+        # Compact key=value context; the keys are documented in the system prompt
+        return (
+            f"tf={self.timeframe} p0={start:.2f} p1={end:.2f} chg={(end - start) / start * 100:.2f}% "
+            f"vol_avg={volume.mean():.0f} vol_last={volume[-1]:.0f} rsi={rsi:.1f} macd={macd:.3f}"
+        )
+
+    def _parse_response(self, response, config=None):
         return {
             'timeframe': self.timeframe,
             'analysis': response,
-            'timestamp': pd.Timestamp.now()
-        }
\ No newline at end of file
+            'timestamp': config_decision_ts(config) or datetime.now(timezone.utc)
+        }
+
+async def abatch_analyze_trends(trend_agents, market_data, max_concurrency=3, decision_ts=None, symbol=None):
+    """Analyze the same bars across several timeframe agents in one bounded batch"""
+    timeframes = list(trend_agents)
+
+    async def analyze(timeframe):
+        return await trend_agents[timeframe].aanalyze_trend(market_data, decision_ts, symbol)
+
+    results = await RunnableLambda(analyze).abatch(timeframes, config={'max_concurrency': max_concurrency})
+    return dict(zip(timeframes, results))
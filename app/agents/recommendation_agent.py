@@ -1,27 +1,10 @@
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage
+from agents.llm import get_chat_model, resolve_model
 import pandas as pd
-from datetime import datetime, timedelta
+import numpy as np
+from datetime import datetime, timedelta, timezone
 
-class StrategyRecommendationAgent:
-    def __init__(self, model="gpt-4"):
-        self.chat_model = ChatOpenAI(model=model)
-        
-    def recommend_strategies(self, user_profile, market_data, strategy_performance):
-        """Generate personalized strategy recommendations"""
-        system_prompt = self._get_system_prompt()
-        analysis_context = self._prepare_context(user_profile, market_data, strategy_performance)
-        
-        messages = [
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=analysis_context)
-        ]
-        
-        response = self.chat_model(messages)
-        return self._parse_response(response.content)
-    
-    def _get_system_prompt(self):
-        return """
+_SYSTEM_PROMPT = """
         You are an expert trading strategy advisor. Your role is to analyze user preferences,
         market conditions, and strategy performance to recommend the most suitable trading approaches.
         
@@ -42,15 +25,45 @@ class StrategyRecommendationAgent:
         
         Make your recommendations specific, actionable, and well-reasoned.
         """
+
+class StrategyRecommendationAgent:
+    def __init__(self, model=None, model_tier=None):
+        self.chat_model = get_chat_model(
+            model or resolve_model('recommendation', model_tier, 'reasoning'),
+            streaming=True
+        )
+        self._system_message = SystemMessage(content=self._get_system_prompt())
+        
+    def recommend_strategies(self, user_profile, market_data, strategy_performance):
+        """Generate personalized strategy recommendations"""
+        analysis_context = self._prepare_context(user_profile, market_data, strategy_performance)
+        
+        messages = [
+            self._system_message,
+            HumanMessage(content=analysis_context)
+        ]
+        
+        response = self.chat_model(messages)
+        return self._parse_response(response.content)
+    
+    def _get_system_prompt(self):
+        return _SYSTEM_PROMPT
     
     def _prepare_context(self, user_profile, market_data, strategy_performance):
+        # Compute the summary scalars once on raw numpy views
+        close = market_data['Close'].to_numpy()
+        volume = market_data['Volume'].to_numpy()
+        first_close, last_close = close[0], close[-1]
+        # ddof=1 matches pandas' sample standard deviation
+        volatility = close.std(ddof=1) / close.mean() * 100
+
         # Format market conditions
         market_summary = f"""
         Market Conditions:
-        Current Price: ${market_data['Close'].iloc[-1]:.2f}
-        30-day Change: {((market_data['Close'].iloc[-1] / market_data['Close'].iloc[0] - 1) * 100):.1f}%
-        Volatility: {market_data['Close'].std() / market_data['Close'].mean() * 100:.1f}%
-        Volume Trend: {'Increasing' if market_data['Volume'].iloc[-1] > market_data['Volume'].mean() else 'Decreasing'}
+        Current Price: ${last_close:.2f}
+        30-day Change: {((last_close / first_close - 1) * 100):.1f}%
+        Volatility: {volatility:.1f}%
+        Volume Trend: {'Increasing' if volume[-1] > volume.mean() else 'Decreasing'}
         """
         
         # Format strategy performance
@@ -81,33 +94,38 @@ class StrategyRecommendationAgent:
     def _parse_response(self, response):
         return {
             'recommendations': response,
-            'timestamp': pd.Timestamp.now(),
+            'timestamp': datetime.now(timezone.utc),
             'version': '1.0'
         }
     
     def calculate_strategy_performance(self, trading_history):
         """Calculate performance metrics for each strategy"""
-        performance = {}
-        
-        for strategy in trading_history.groupby('strategy'):
-            strategy_name, trades = strategy
-            
-            # Calculate basic performance metrics
-            wins = trades[trades['exit_price'] > trades['entry_price']].shape[0]
-            total_trades = trades.shape[0]
-            win_rate = wins / total_trades if total_trades > 0 else 0
-            
-            # Calculate returns
-            returns = ((trades['exit_price'] - trades['entry_price']) / trades['entry_price'])
-            avg_return = returns.mean() if not returns.empty else 0
-            max_drawdown = (returns + 1).cumprod().expanding().max() - (returns + 1).cumprod()
-            max_drawdown = max_drawdown.max() if not max_drawdown.empty else 0
-            
-            performance[strategy_name] = {
-                'win_rate': f"{win_rate:.1%}",
-                'avg_return': f"{avg_return:.1%}",
-                'max_drawdown': f"{max_drawdown:.1%}",
-                'total_trades': total_trades
+        # Open positions have NULL exit prices, which arrive as an object column of None
+        entry_price = pd.to_numeric(trading_history['entry_price'], errors='coerce')
+        exit_price = pd.to_numeric(trading_history['exit_price'], errors='coerce')
+        trades = trading_history.assign(
+            ret=(exit_price - entry_price) / entry_price,
+            win=(exit_price > entry_price).astype(np.int8)
+        )
+        by_strategy = trades.groupby('strategy')
+
+        # Drawdown of the compounded return curve, computed per strategy in one pass
+        equity = (trades['ret'] + 1).groupby(trades['strategy']).cumprod()
+        drawdown = (equity.groupby(trades['strategy']).cummax() - equity).groupby(trades['strategy']).max()
+
+        stats = by_strategy.agg(
+            wins=('win', 'sum'),
+            total_trades=('win', 'size'),
+            avg_return=('ret', 'mean')
+        )
+        stats['max_drawdown'] = drawdown
+
+        return {
+            row.Index: {
+                'win_rate': f"{row.wins / row.total_trades:.1%}",
+                'avg_return': f"{row.avg_return:.1%}",
+                'max_drawdown': f"{row.max_drawdown:.1%}",
+                'total_trades': int(row.total_trades)
             }
-        
-        return performance
+            for row in stats.itertuples()
+        }
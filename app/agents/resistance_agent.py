@@ -1,25 +1,10 @@
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage
+from agents.llm import get_chat_model, resolve_model
+from pydantic import BaseModel, Field
+from typing import List, Literal
 import pandas as pd
 
-class ResistanceAnalysisAgent:
-    def __init__(self, model="gpt-4"):
-        self.chat_model = ChatOpenAI(model=model)
-
-    def analyze_resistance(self, market_data, entry_price, exit_price):
-        system_prompt = self._get_system_prompt()
-        market_context = self._prepare_market_context(market_data, entry_price, exit_price)
-
-        messages = [
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=market_context)
-        ]
-
-        response = self.chat_model(messages)
-        return self._parse_response(response.content)
-
-    def _get_system_prompt(self):
-        return """
+_SYSTEM_PROMPT = """
         You are an expert technical analyst specializing in identifying resistance levels using candlestick patterns.
         Analyze the provided price data and determine if there are any significant resistance levels between the given entry and exit prices.
 
@@ -30,82 +15,60 @@ class ResistanceAnalysisAgent:
         4. Candlestick reversal patterns
         5. Previous support/resistance flips
 
-        Provide your analysis in the following format:
-        1. Resistance levels identified: [list of price levels]
-        2. Strength of resistance (0-1 for each level)
-        3. Volume confirmation (yes/no)
-        4. Trading recommendation (PROCEED/DO_NOT_BUY)
-        5. Confidence in analysis (0-1)
-        6. Brief explanation
+        Report the resistance levels found, their overall strength, whether volume confirms them,
+        a PROCEED/DO_NOT_BUY recommendation, your confidence and a brief explanation.
+
+        Market data is given as key=value pairs: entry/exit=target prices, px=current price,
+        hi/lo=period high/low, vol_avg=average volume, highs10/vols10=last 10 highs/volumes (oldest first).
         """
 
-    def _prepare_market_context(self, market_data, entry_price, exit_price):
-        # Get key price levels
-        high = market_data['High'].max()
-        low = market_data['Low'].min()
-        current_price = market_data['Close'].iloc[-1]
-        avg_volume = market_data['Volume'].mean()
-        
-        # Get recent price action
-        recent_highs = market_data['High'].tail(10).tolist()
-        recent_volumes = market_data['Volume'].tail(10).tolist()
+class ResistanceResult(BaseModel):
+    resistance_levels: List[float] = Field(description="Resistance price levels between entry and exit")
+    strength: float = Field(description="Strength of the resistance (0-1)")
+    volume_confirmed: bool = Field(description="Whether volume confirms the resistance")
+    recommendation: Literal['PROCEED', 'DO_NOT_BUY']
+    confidence: float = Field(description="Confidence in the analysis (0-1)")
+    explanation: str = Field(description="Brief explanation")
 
-        return f"""
-        Market Analysis Context:
-        
-        Target Range Analysis:
-        Entry Price: ${entry_price:.2f}
-        Exit Price: ${exit_price:.2f}
-        Current Price: ${current_price:.2f}
-        
-        Historical Context:
-        All-time High: ${high:.2f}
-        All-time Low: ${low:.2f}
-        Average Volume: {avg_volume:,.0f}
-        
-        Recent Price Action:
-        Last 10 Highs: {recent_highs}
-        Last 10 Volumes: {recent_volumes}
-        
-        Please analyze if there are significant resistance levels between ${entry_price:.2f} and ${exit_price:.2f} 
-        that could impede price movement.
-        """
+class ResistanceAnalysisAgent:
+    def __init__(self, model=None, model_tier=None):
+        # The model answers straight into ResistanceResult, so there is no free text to parse
+        self.chat_model = get_chat_model(
+            model or resolve_model('resistance', model_tier),
+            max_tokens=512
+        ).with_structured_output(
+            ResistanceResult, method="function_calling"
+        )
+        self._system_message = SystemMessage(content=self._get_system_prompt())
+
+    def analyze_resistance(self, market_data, entry_price, exit_price):
+        market_context = self._prepare_market_context(market_data, entry_price, exit_price)
+
+        messages = [
+            self._system_message,
+            HumanMessage(content=market_context)
+        ]
+
+        return self.chat_model.invoke(messages).model_dump()
 
-    def _parse_response(self, response):
-        lines = response.strip().split('\n')
-        result = {
-            'resistance_levels': [],
-            'strength': 0.0,
-            'volume_confirmed': False,
-            'recommendation': 'PROCEED',
-            'confidence': 0.0,
-            'explanation': ''
-        }
+    def _get_system_prompt(self):
+        return _SYSTEM_PROMPT
 
-        for line in lines:
-            line = line.lower().strip()
-            if 'resistance levels' in line:
-                try:
-                    # Extract price levels from the response
-                    levels = [float(x.strip('$').strip()) for x in line.split(':')[1].strip('[]').split(',')]
-                    result['resistance_levels'] = levels
-                except:
-                    pass
-            elif 'strength' in line:
-                try:
-                    result['strength'] = float(line.split(':')[1].strip())
-                except:
-                    pass
-            elif 'volume confirmation' in line:
-                result['volume_confirmed'] = 'yes' in line
-            elif 'trading recommendation' in line:
-                result['recommendation'] = 'DO_NOT_BUY' if 'do_not_buy' in line else 'PROCEED'
-            elif 'confidence' in line:
-                try:
-                    result['confidence'] = float(line.split(':')[1].strip())
-                except:
-                    pass
-            elif 'explanation' in line:
-                result['explanation'] = line.split(':')[1].strip()
+    def _prepare_market_context(self, market_data, entry_price, exit_price):
+        # Get key price levels from raw numpy views
+        highs = market_data['High'].to_numpy()
+        volumes = market_data['Volume'].to_numpy()
+        current_price = market_data['Close'].to_numpy()[-1]
+        avg_volume = volumes.mean()
+        
+        # Get recent price action
+        recent_highs = ",".join(f"{x:.2f}" for x in highs[-10:])
+        recent_volumes = ",".join(f"{x:.0f}" for x in volumes[-10:])
 
-        return result
+        # Compact key=value context; the keys are documented in the system prompt
+        return (
+            f"entry={entry_price:.2f} exit={exit_price:.2f} px={current_price:.2f} "
+            f"hi={highs.max():.2f} lo={market_data['Low'].to_numpy().min():.2f} vol_avg={avg_volume:.0f}\n"
+            f"highs10={recent_highs}\n"
+            f"vols10={recent_volumes}"
+        )
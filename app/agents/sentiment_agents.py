@@ -1,74 +1,136 @@
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage
-import pandas as pd
+from agents.llm import ainvoke_with_retry, config_decision_ts, get_chat_model, resolve_model
+from langchain_core.runnables import RunnableLambda
 import os
-from datetime import datetime, timedelta
+import threading
+from cachetools import TTLCache
+from datetime import datetime, timedelta, timezone
+
+_SYSTEM_PROMPT_TEMPLATE = """
+        You are a financial news sentiment analyzer focusing on {timeframe} trends.
+        Analyze the provided news articles and provide:
+        1. Overall sentiment score (-1 to 1)
+        2. Key themes and topics
+        3. Notable events or announcements
+        4. Potential market impact
+        5. Risk factors
+
+        Consider:
+        - Article source credibility
+        - Publication timing
+        - Market reaction to news
+        - Sentiment consistency across sources
+        """
 
 class SentimentAgent:
-    def __init__(self, timeframe, model="gpt-4"):
+    def __init__(self, timeframe, model=None, model_tier=None):
         self.timeframe = timeframe  # '30d', '15d', or '3d'
-        self.chat_model = ChatOpenAI(model=model)
+        self.chat_model = get_chat_model(
+            model or resolve_model('sentiment', model_tier),
+            streaming=True,
+            max_tokens=512
+        )
+        self._system_prompt = _SYSTEM_PROMPT_TEMPLATE.format(timeframe=self.timeframe)
+        self._system_message = SystemMessage(content=self._system_prompt)
         self.tavily_api_key = os.getenv('TAVILY_API_KEY')
         if self.tavily_api_key:
-            from tavily import TavilyClient
+            from tavily import AsyncTavilyClient, TavilyClient
             self.tavily_client = TavilyClient(api_key=self.tavily_api_key)
+            self.async_tavily_client = AsyncTavilyClient(api_key=self.tavily_api_key)
+        # News moves slowly, so a symbol's analysis is reused for up to 30 minutes
+        self._results = TTLCache(maxsize=256, ttl=1800)
+        self._results_lock = threading.Lock()
 
-    def analyze_sentiment(self, symbol):
+    def analyze_sentiment(self, symbol, decision_ts=None):
         if not self.tavily_api_key:
-            return self._generate_mock_sentiment(symbol)
+            return self._generate_mock_sentiment(symbol, decision_ts)
+
+        cached = self._cached_result(symbol, decision_ts)
+        if cached is not None:
+            return cached
 
         # Fetch news articles using Tavily
         news_data = self._fetch_news(symbol)
 
         # Analyze sentiment using LLM
-        system_prompt = self._get_system_prompt()
-        news_context = self._prepare_news_context(news_data)
+        response = self.chat_model(self._build_messages(news_data))
+        return self._store_result(symbol, self._parse_response(response.content, news_data, decision_ts))
 
-        messages = [
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=news_context)
-        ]
+    async def aanalyze_sentiment(self, symbol, decision_ts=None):
+        if not self.tavily_api_key:
+            return self._generate_mock_sentiment(symbol, decision_ts)
+
+        cached = self._cached_result(symbol, decision_ts)
+        if cached is not None:
+            return cached
+
+        # Non-blocking search, so other agents keep running while Tavily responds
+        news_data = await self._afetch_news(symbol)
+
+        response = await ainvoke_with_retry(self.chat_model, self._build_messages(news_data))
+        return self._store_result(symbol, self._parse_response(response.content, news_data, decision_ts))
+
+    def _cached_result(self, symbol, decision_ts=None):
+        with self._results_lock:
+            result = self._results.get(symbol)
+        if result is None:
+            return None
+        # Same analysis, stamped with this run's decision time
+        return dict(result, timestamp=decision_ts or result['timestamp'])
+
+    def _store_result(self, symbol, result):
+        with self._results_lock:
+            self._results[symbol] = result
+        return result
+
+    def as_chain(self):
+        """Wrap the analysis as an LCEL runnable: symbol in, sentiment analysis out"""
+        return RunnableLambda(self._run_chain, afunc=self._arun_chain)
+
+    def _run_chain(self, symbol, config):
+        return self.analyze_sentiment(symbol, config_decision_ts(config))
 
-        response = self.chat_model(messages)
-        return self._parse_response(response.content, news_data)
+    async def _arun_chain(self, symbol, config):
+        return await self.aanalyze_sentiment(symbol, config_decision_ts(config))
+
+    def _build_messages(self, news_data):
+        return [
+            self._system_message,
+            HumanMessage(content=self._prepare_news_context(news_data))
+        ]
 
     def _fetch_news(self, symbol):
         if not self.tavily_api_key:
             return []
 
-        query = f"{symbol} stock news last {self.timeframe}"
-        search_results = self.tavily_client.search(
-            query=query,
-            search_depth="advanced",
-            include_domains=["reuters.com", "bloomberg.com", "seekingalpha.com", "fool.com"]
-        )
+        search_results = self.tavily_client.search(**self._search_params(symbol))
         return search_results.get('results', [])
 
-    def _generate_mock_sentiment(self, symbol):
+    async def _afetch_news(self, symbol):
+        if not self.tavily_api_key:
+            return []
+
+        search_results = await self.async_tavily_client.search(**self._search_params(symbol))
+        return search_results.get('results', [])
+
+    def _search_params(self, symbol):
+        return {
+            'query': f"{symbol} stock news last {self.timeframe}",
+            'search_depth': "advanced",
+            'include_domains': ["reuters.com", "bloomberg.com", "seekingalpha.com", "fool.com"]
+        }
+
+    def _generate_mock_sentiment(self, symbol, decision_ts=None):
         return {
             'timeframe': self.timeframe,
             'analysis': f"Sentiment analysis unavailable for {symbol} - Tavily API key not configured. "
                        "Please configure TAVILY_API_KEY to enable sentiment analysis.",
             'news_count': 0,
-            'timestamp': pd.Timestamp.now()
+            'timestamp': decision_ts or datetime.now(timezone.utc)
         }
 
     def _get_system_prompt(self):
-        return f"""
-        You are a financial news sentiment analyzer focusing on {self.timeframe} trends.
-        Analyze the provided news articles and provide:
-        1. Overall sentiment score (-1 to 1)
-        2. Key themes and topics
-        3. Notable events or announcements
-        4. Potential market impact
-        5. Risk factors
-
-        Consider:
-        - Article source credibility
-        - Publication timing
-        - Market reaction to news
-        - Sentiment consistency across sources
-        """
+        return self._system_prompt
 
     def _prepare_news_context(self, news_data):
         if not news_data:
@@ -89,10 +151,10 @@ class SentimentAgent:
         Please analyze the sentiment and potential market impact of these articles.
         """
 
-    def _parse_response(self, response, news_data):
+    def _parse_response(self, response, news_data, decision_ts=None):
         return {
             'timeframe': self.timeframe,
             'analysis': response,
             'news_count': len(news_data),
-            'timestamp': pd.Timestamp.now()
+            'timestamp': decision_ts or datetime.now(timezone.utc)
         }
\ No newline at end of file
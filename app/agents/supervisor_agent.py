@@ -1,25 +1,19 @@
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage
-import pandas as pd
+from agents.llm import (
+    ainvoke_with_retry, config_decision_ts, config_symbol, get_chat_model, resolve_model, run_sync, shared_semantic_cache
+)
+from datetime import datetime, timezone
+import asyncio
+import io
+import json
+import re
+import time
+from typing import Optional, TypedDict
+from agents.trading_agents import analyze_all
+from langchain_core.runnables import RunnableLambda, RunnableParallel, RunnablePassthrough
+from operator import itemgetter
 
-class SupervisorAgent:
-    def __init__(self, model="gpt-4"):
-        self.chat_model = ChatOpenAI(model=model)
-
-    def make_decision(self, trading_signals, market_trends, sentiment_analysis, resistance_analysis=None):
-        system_prompt = self._get_system_prompt()
-        context = self._prepare_context(trading_signals, market_trends, sentiment_analysis, resistance_analysis)
-
-        messages = [
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=context)
-        ]
-
-        response = self.chat_model(messages)
-        return self._parse_decision(response.content)
-
-    def _get_system_prompt(self):
-        return """
+_SYSTEM_PROMPT = """
         You are the chief investment officer of an AI-driven hedge fund.
         Your role is to analyze signals from multiple sources and make final trading decisions.
 
@@ -42,101 +36,326 @@ class SupervisorAgent:
            - Market trend alignment
            - Sentiment impact
            - Risk factors to monitor
+
+        Base the decision on the signals, trends, sentiment and resistance analysis
+        supplied in the user message.
+        """
+
+# (label, renderer) pairs for each block written by SupervisorAgent._format_dict
+_SIGNAL_FIELDS = (
+    ('Signal', lambda signal: 'Buy' if signal.get('buy', False) else 'Sell' if signal.get('sell', False) else 'Hold'),
+    ('Confidence', lambda signal: f"{signal.get('confidence', 0.0):.2f}")
+)
+
+_ANALYSIS_FIELDS = (
+    ('Analysis', lambda analysis: analysis.get('analysis', 'No analysis available')),
+)
+
+_RESISTANCE_FIELDS = (
+    ('Recommendation', lambda analysis: analysis['recommendation']),
+    ('Resistance Levels', lambda analysis: ', '.join(f'${level:.2f}' for level in analysis['resistance_levels'])),
+    ('Confidence', lambda analysis: f"{analysis['confidence']:.2f}"),
+    ('Explanation', lambda analysis: analysis['explanation'])
+)
+
+# Field lines that start the supervisor's answer, e.g. "2. **Confidence level (0-1):** 0.8". Anchored
+# to the line start so prose such as "given the high confidence: ..." is never read as a field
+_DECISION_FIELD_RE = re.compile(
+    r'^\s*(?:\d+\.\s*)?\**(trading action|confidence|risk assessment|position size|supporting rationale)'
+    r'(?:\s+(?:level|recommendation|including))?(?:\s*\([^)\n]*\))?\**\s*:\**\s*(.*)$',
+    re.IGNORECASE | re.MULTILINE
+)
+_CONFIDENCE_RE = re.compile(r'(\d*\.?\d+)\s*(%?)')
+
+def _parse_confidence(decision_dict, value):
+    match = _CONFIDENCE_RE.search(value)
+    if not match:
+        # Unreadable, so treat it like a missing confidence
+        decision_dict['confidence'] = None
+        return
+    confidence = float(match.group(1)) / (100 if match.group(2) else 1)
+    decision_dict['confidence'] = min(1.0, max(0.0, confidence))
+
+_DECISION_FIELD_HANDLERS = {
+    'trading action': lambda decision_dict, value: decision_dict.__setitem__('action', value),
+    'confidence': _parse_confidence,
+    'risk assessment': lambda decision_dict, value: decision_dict.__setitem__('risk', value),
+    'position size': lambda decision_dict, value: decision_dict.__setitem__('position_size', value)
+}
+
+class Decision(TypedDict):
+    """What make_decision returns; the caller reads confidence directly instead of re-parsing the text"""
+    decision: str
+    # Parsed from the "Confidence" line; None when the model gave no readable value
+    confidence: Optional[float]
+    timestamp: datetime
+
+# Decision fields astream_decision reports as soon as their line is complete
+_STREAMED_FIELDS = ('action', 'confidence', 'risk', 'position_size')
+
+def _trend_branch(agent):
+    """Pipeline branch for one trend agent, going through its per-symbol result cache"""
+    def run(inputs, config):
+        return agent.analyze_trend(inputs['market_data'], config_decision_ts(config), inputs['symbol'])
+
+    async def arun(inputs, config):
+        return await agent.aanalyze_trend(inputs['market_data'], config_decision_ts(config), inputs['symbol'])
+
+    return RunnableLambda(run, afunc=arun)
+
+def _signals_branch(trading_agents):
+    """Pipeline branch running every strategy agent on the symbol's bars: {strategy: signal}"""
+    def run(inputs):
+        return {name: agent.analyze(inputs['market_data'], inputs['symbol']) for name, agent in trading_agents.items()}
+
+    async def arun(inputs):
+        signals = await analyze_all(trading_agents, {inputs['symbol']: inputs['market_data']})
+        return signals[inputs['symbol']]
+
+    return RunnableLambda(run, afunc=arun)
+
+class SupervisorAgent:
+    def __init__(self, model=None, model_tier=None, semantic_cache=None):
+        self.chat_model = get_chat_model(
+            model or resolve_model('supervisor', model_tier, 'reasoning'),
+            streaming=True,
+            # Decisions are reused only through the TTL'd semantic cache, never the persistent LLM cache
+            cache=False
+        )
+        self._system_message = SystemMessage(content=self._get_system_prompt())
+        # Repeated ticks with unchanged inputs for the same symbol reuse the previous decision
+        self.semantic_cache = semantic_cache or shared_semantic_cache()
+
+    def make_decision(self, trading_signals, market_trends, sentiment_analysis, resistance_analysis=None,
+                      symbol=None) -> Decision:
+        return run_sync(self.amake_decision(
+            trading_signals, market_trends, sentiment_analysis, resistance_analysis, symbol=symbol
+        ))
+
+    async def amake_decision(self, trading_signals, market_trends, sentiment_analysis, resistance_analysis=None,
+                             decision_ts=None, symbol=None) -> Decision:
+        messages = self._build_messages(trading_signals, market_trends, sentiment_analysis, resistance_analysis)
+        response = await self._acomplete(messages, {'configurable': {'symbol': symbol}})
+        return self._parse_decision(response, decision_ts)
+
+    async def astream_decision(self, trading_signals, market_trends, sentiment_analysis, resistance_analysis=None):
+        """Stream the decision as events so a UI can render text and fields before the rationale finishes
+
+        Yields {'type': 'token', 'content'} for every chunk, {'type': 'field', 'name', 'value'}
+        as soon as a completed line sets action/confidence/risk/position_size, and finally
+        {'type': 'decision', 'decision'} with the same shape make_decision returns.
+        """
+        messages = self._build_messages(trading_signals, market_trends, sentiment_analysis, resistance_analysis)
+        decision_dict = self._new_decision_dict()
+        current_section = None
+        chunks = []
+        pending = ''
+
+        async for chunk in self.chat_model.astream(messages):
+            chunks.append(chunk.content)
+            yield {'type': 'token', 'content': chunk.content}
+
+            pending += chunk.content
+            *lines, pending = pending.split('\n')
+            for line in lines:
+                current_section, events = self._stream_line_events(decision_dict, line, current_section)
+                for event in events:
+                    yield event
+
+        # The last line has no trailing newline
+        for event in self._stream_line_events(decision_dict, pending, current_section)[1]:
+            yield event
+
+        yield {'type': 'decision', 'decision': self._parse_decision(''.join(chunks))}
+
+    def _stream_line_events(self, decision_dict, line, current_section):
+        """Parse one streamed line; return the new section and events for fields it changed"""
+        before = {name: decision_dict[name] for name in _STREAMED_FIELDS}
+        current_section = self._parse_decision_line(decision_dict, line, current_section)
+        return current_section, [
+            {'type': 'field', 'name': name, 'value': decision_dict[name]}
+            for name in _STREAMED_FIELDS if decision_dict[name] != before[name]
+        ]
+
+    def make_decisions_batch(self, inputs, batch_threshold=20, poll_interval=30):
+        """Decide for many symbols at once: {symbol: make_decision kwargs} -> {symbol: decision}
+
+        Small runs fan out concurrently; larger offline runs go through the OpenAI
+        Batch API, which is half the price but can take minutes to complete.
         """
+        decision_ts = datetime.now(timezone.utc)
+        if len(inputs) <= batch_threshold:
+            async def fan_out():
+                symbols = list(inputs)
+                decisions = await asyncio.gather(*(
+                    self.amake_decision(**inputs[symbol], decision_ts=decision_ts, symbol=symbol) for symbol in symbols
+                ))
+                return dict(zip(symbols, decisions))
+
+            return run_sync(fan_out())
+
+        from openai import OpenAI
+        client = OpenAI()
+
+        lines = []
+        for symbol, kwargs in inputs.items():
+            lines.append(json.dumps({
+                'custom_id': symbol,
+                'method': 'POST',
+                'url': '/v1/chat/completions',
+                'body': {
+                    'model': self.chat_model.model_name,
+                    'messages': [
+                        {'role': 'system', 'content': self._system_message.content},
+                        {'role': 'user', 'content': self._prepare_context(**kwargs)}
+                    ]
+                }
+            }))
+
+        batch_file = client.files.create(file=('decisions.jsonl', "\n".join(lines).encode()), purpose='batch')
+        batch = client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint='/v1/chat/completions',
+            completion_window='24h'
+        )
+        while batch.status not in ('completed', 'failed', 'expired', 'cancelled'):
+            time.sleep(poll_interval)
+            batch = client.batches.retrieve(batch.id)
+
+        if batch.status != 'completed' or not batch.output_file_id:
+            print(f"Decision batch {batch.id} ended with status {batch.status}")
+            return {}
+
+        decisions = {}
+        for line in client.files.content(batch.output_file_id).text.splitlines():
+            result = json.loads(line)
+            response = result.get('response') or {}
+            if response.get('status_code') != 200:
+                print(f"Batch decision failed for {result['custom_id']}: {result.get('error')}")
+                continue
+            content = response['body']['choices'][0]['message']['content']
+            decisions[result['custom_id']] = self._parse_decision(content, decision_ts)
+        return decisions
+
+    async def arun_pipeline(self, symbol, market_data, trading_signals, trend_agents, sentiment_agents,
+                            resistance_analysis=None, trading_agents=None):
+        """Run the whole pipeline once and return (trading_signals, market_trends, sentiment_analysis, decision)
+
+        With trading_agents the strategy signals are computed inside the graph, alongside the
+        trend and sentiment branches, and trading_signals may be None.
+        """
+        result = await self.build_pipeline(trend_agents, sentiment_agents, trading_agents).ainvoke(
+            {
+                'symbol': symbol,
+                'market_data': market_data,
+                'trading_signals': trading_signals,
+                'resistance_analysis': resistance_analysis
+            },
+            # One timestamp for every output of this run; the symbol keys the response caches
+            {'configurable': {'decision_ts': datetime.now(timezone.utc), 'symbol': symbol}}
+        )
+        return result['trading_signals'], result['market_trends'], result['sentiment_analysis'], result['decision']
+
+    def build_pipeline(self, trend_agents, sentiment_agents, trading_agents=None):
+        """Compose every agent into one LCEL graph whose branches run concurrently
+
+        Input: {'symbol', 'market_data', 'trading_signals', 'resistance_analysis'}
+        Output: the same keys minus symbol/market_data, plus 'market_trends',
+        'sentiment_analysis' and 'decision'. Given trading_agents, 'trading_signals'
+        is produced by them instead of read from the input.
+        """
+        upstream = RunnableParallel(
+            market_trends=RunnableParallel({
+                timeframe: _trend_branch(agent)
+                for timeframe, agent in trend_agents.items()
+            }),
+            sentiment_analysis=RunnableParallel({
+                timeframe: itemgetter('symbol') | agent.as_chain()
+                for timeframe, agent in sentiment_agents.items()
+            }),
+            trading_signals=_signals_branch(trading_agents) if trading_agents else itemgetter('trading_signals'),
+            resistance_analysis=lambda inputs: inputs.get('resistance_analysis')
+        )
+        return upstream | RunnablePassthrough.assign(decision=self.as_chain())
+
+    def as_chain(self):
+        """Build the decision as an LCEL runnable: upstream analyses in, parsed decision out"""
+        return (
+            RunnableLambda(lambda inputs: self._build_messages(
+                inputs['trading_signals'], inputs['market_trends'],
+                inputs['sentiment_analysis'], inputs.get('resistance_analysis')
+            ))
+            | RunnableLambda(self._complete, afunc=self._acomplete)
+            | RunnableLambda(self._parse_chain_output)
+        )
+
+    # The prompt has no symbol and a Buy/Sell flip changes only a few tokens, so decisions
+    # are cached per symbol and only for byte-identical inputs
+    def _complete(self, messages, config=None):
+        return self.semantic_cache.get_or_call(
+            ('supervisor', config_symbol(config)), messages[-1].content,
+            lambda: self.chat_model.invoke(messages).content,
+            semantic=False
+        )
+
+    async def _acomplete(self, messages, config=None):
+        async def acall():
+            return (await ainvoke_with_retry(self.chat_model, messages)).content
+
+        return await self.semantic_cache.aget_or_call(
+            ('supervisor', config_symbol(config)), messages[-1].content, acall, semantic=False
+        )
+
+    def _parse_chain_output(self, response, config):
+        return self._parse_decision(response, config_decision_ts(config))
+
+    def _build_messages(self, trading_signals, market_trends, sentiment_analysis, resistance_analysis=None):
+        # Static system prompt first, per-call data last, so the provider can reuse the cached prefix
+        return [
+            self._system_message,
+            HumanMessage(content=self._prepare_context(trading_signals, market_trends, sentiment_analysis, resistance_analysis))
+        ]
+
+    def _get_system_prompt(self):
+        return _SYSTEM_PROMPT
 
     def _prepare_context(self, trading_signals, market_trends, sentiment_analysis, resistance_analysis=None):
         context = f"""
         Trading Signals Summary:
-        {self._format_trading_signals(trading_signals)}
+        {self._format_dict(trading_signals, 'Strategy', _SIGNAL_FIELDS)}
 
         Market Trends:
-        {self._format_market_trends(market_trends)}
+        {self._format_dict(market_trends, 'Timeframe', _ANALYSIS_FIELDS)}
 
         Sentiment Analysis:
-        {self._format_sentiment(sentiment_analysis)}
+        {self._format_dict(sentiment_analysis, 'Timeframe', _ANALYSIS_FIELDS)}
         """
 
         if resistance_analysis:
-            context += f"\nResistance Analysis:\n{self._format_resistance(resistance_analysis)}"
+            context += f"\nResistance Analysis:\n{self._format_dict(resistance_analysis, 'Strategy', _RESISTANCE_FIELDS)}"
 
-        context += "\nPlease provide a comprehensive trading decision based on this information."
         return context
 
-    def _format_trading_signals(self, signals):
-        formatted_signals = []
-        for strategy, signal in signals.items():
-            signal_type = 'Buy' if signal.get('buy', False) else 'Sell' if signal.get('sell', False) else 'Hold'
-            confidence = signal.get('confidence', 0.0)
-            formatted_signals.append(
-                f"Strategy: {strategy}\n"
-                f"Signal: {signal_type}\n"
-                f"Confidence: {confidence:.2f}\n"
-            )
-        return "\n".join(formatted_signals)
-
-    def _format_market_trends(self, trends):
-        formatted_trends = []
-        for timeframe, analysis in trends.items():
-            formatted_trends.append(
-                f"Timeframe: {timeframe}\n"
-                f"Analysis: {analysis.get('analysis', 'No analysis available')}\n"
-            )
-        return "\n".join(formatted_trends)
-
-    def _format_sentiment(self, sentiment):
-        formatted_sentiment = []
-        for timeframe, analysis in sentiment.items():
-            formatted_sentiment.append(
-                f"Timeframe: {timeframe}\n"
-                f"Analysis: {analysis.get('analysis', 'No analysis available')}\n"
-            )
-        return "\n".join(formatted_sentiment)
-
-    def _format_resistance(self, resistance_analysis):
-        formatted_resistance = []
-        for strategy, analysis in resistance_analysis.items():
-            formatted_resistance.append(
-                f"Strategy: {strategy}\n"
-                f"Recommendation: {analysis['recommendation']}\n"
-                f"Resistance Levels: {', '.join(f'${level:.2f}' for level in analysis['resistance_levels'])}\n"
-                f"Confidence: {analysis['confidence']:.2f}\n"
-                f"Explanation: {analysis['explanation']}\n"
-            )
-        return "\n".join(formatted_resistance)
-
-    def _parse_decision(self, response):
-        lines = response.strip().split('\n')
-        decision_dict = {
-            'action': 'HOLD',
-            'confidence': 0.0,
-            'risk': 'Medium',
-            'rationale': [],
-            'position_size': '0%'
-        }
-
-        current_section = None
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
+    def _format_dict(self, items, key_label, fields):
+        """Render {key: value} as labelled blocks separated by blank lines"""
+        buf = io.StringIO()
+        for index, (key, value) in enumerate(items.items()):
+            if index:
+                buf.write("\n")
+            buf.write(f"{key_label}: {key}\n")
+            for label, render in fields:
+                buf.write(f"{label}: {render(value)}\n")
+        return buf.getvalue()
 
-            if 'trading action' in line.lower():
-                decision_dict['action'] = line.split(':')[-1].strip()
-                current_section = 'action'
-            elif 'confidence' in line.lower():
-                try:
-                    confidence = float(line.split(':')[-1].strip())
-                    decision_dict['confidence'] = min(1.0, max(0.0, confidence))
-                except:
-                    decision_dict['confidence'] = 0.8
-            elif 'risk' in line.lower() and 'assessment' in line.lower():
-                decision_dict['risk'] = line.split(':')[-1].strip()
-            elif 'position size' in line.lower():
-                decision_dict['position_size'] = line.split(':')[-1].strip()
-            elif 'supporting rationale' in line.lower():
-                current_section = 'rationale'
-            elif current_section == 'rationale':
-                decision_dict['rationale'].append(line)
+    def _parse_decision(self, response, decision_ts=None) -> Decision:
+        decision_dict = self._new_decision_dict()
+        for match in _DECISION_FIELD_RE.finditer(response):
+            field, value = match.group(1).lower(), match.group(2)
+            if field == 'supporting rationale':
+                # Everything from the rationale header on is rationale, field-like lines included
+                decision_dict['rationale'] = [line.strip() for line in response[match.start(2):].split('\n')]
+                break
+            _DECISION_FIELD_HANDLERS[field](decision_dict, value.strip(' *'))
 
         # Format the final decision text with complete rationale
         decision_text = f"{decision_dict['action']} - Position Size: {decision_dict['position_size']}\n\n"
@@ -149,5 +368,31 @@ class SupervisorAgent:
         return {
             'decision': decision_text,
             'confidence': decision_dict['confidence'],
-            'timestamp': pd.Timestamp.now()
-        }
\ No newline at end of file
+            'timestamp': decision_ts or datetime.now(timezone.utc)
+        }
+
+    def _new_decision_dict(self):
+        return {
+            'action': 'HOLD',
+            # None until the response states a confidence; callers pick their own default
+            'confidence': None,
+            'risk': 'Medium',
+            'rationale': [],
+            'position_size': '0%'
+        }
+
+    def _parse_decision_line(self, decision_dict, line, current_section):
+        """Fold one streamed line into decision_dict and return the section now being read"""
+        if current_section == 'rationale':
+            decision_dict['rationale'].append(line.strip())
+            return current_section
+
+        match = _DECISION_FIELD_RE.match(line)
+        if not match:
+            return current_section
+        field, value = match.group(1).lower(), match.group(2)
+        if field == 'supporting rationale':
+            decision_dict['rationale'].append(value.strip())
+            return 'rationale'
+        _DECISION_FIELD_HANDLERS[field](decision_dict, value.strip(' *'))
+        return field
\ No newline at end of file
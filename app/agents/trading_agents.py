@@ -1,57 +1,81 @@
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage
+from agents.llm import ainvoke_with_retry, get_chat_model, resolve_model, run_sync, shared_semantic_cache
 import pandas as pd
+import asyncio
+from functools import lru_cache
+
+@lru_cache(maxsize=256)
+def _market_context(close, volume, prev_close, macd, rsi, upper_band, lower_band):
+    """Prompt fragment for the latest bar; unchanged bars reuse the rendered string"""
+    return f"""
+        Recent market data:
+        Close price: {close:.2f}
+        Volume: {volume}
+        Price change: {(close - prev_close) / prev_close * 100:.2f}%
+
+        Technical indicators:
+        MACD: {macd:.3f}
+        RSI: {rsi:.2f}
+        Bollinger Bands position: {_bb_position(close, upper_band, lower_band)}
+        """
+
+def _bb_position(close, upper_band, lower_band):
+    if close > upper_band:
+        return "Above upper band"
+    elif close < lower_band:
+        return "Below lower band"
+    else:
+        return "Within bands"
 
 class TradingAgent:
-    def __init__(self, strategy, model="gpt-4"):
+    def __init__(self, strategy, model=None, model_tier=None, semantic_cache=None):
         self.strategy = strategy
-        self.chat_model = ChatOpenAI(model=model)
+        self.chat_model = get_chat_model(
+            model or resolve_model('trading', model_tier, 'reasoning'),
+            streaming=True,
+            # Answers are reused only through the TTL'd semantic cache, never the persistent LLM cache
+            cache=False
+        )
+        # Strategy prompts are static, so build the system message once
+        self._system_message = SystemMessage(content=strategy.get_prompt())
+        self.semantic_cache = semantic_cache or shared_semantic_cache()
+
+    def analyze(self, market_data, symbol=None):
+        return run_sync(self.aanalyze(market_data, symbol))
 
-    def analyze(self, market_data):
+    async def aanalyze(self, market_data, symbol=None):
         # Get strategy-specific signals
         signals = self.strategy.generate_signals(market_data)
 
         # Prepare the prompt
-        system_prompt = self.strategy.get_prompt()
         market_context = self._prepare_market_context(market_data)
 
         messages = [
-            SystemMessage(content=system_prompt),
+            self._system_message,
             HumanMessage(content=market_context)
         ]
 
-        # Get LLM response
-        response = self.chat_model(messages)
+        async def acall():
+            return (await ainvoke_with_retry(self.chat_model, messages)).content
+
+        # Get LLM response, reusing this symbol's answer only for an identical market context;
+        # near-identical numeric contexts embed almost the same but describe different markets
+        response = await self.semantic_cache.aget_or_call(
+            ('trading', type(self.strategy).__name__, symbol), market_context, acall, semantic=False
+        )
 
         # Combine quantitative and qualitative signals
-        final_signal = self._combine_signals(signals, response.content)
+        final_signal = self._combine_signals(signals, response)
 
         return final_signal
 
     def _prepare_market_context(self, market_data):
-        return f"""
-        Recent market data:
-        Close price: {market_data['Close'].iloc[-1]:.2f}
-        Volume: {market_data['Volume'].iloc[-1]}
-        Price change: {(market_data['Close'].iloc[-1] - market_data['Close'].iloc[-2]) / market_data['Close'].iloc[-2] * 100:.2f}%
-
-        Technical indicators:
-        MACD: {market_data['MACD'].iloc[-1]:.3f}
-        RSI: {market_data['RSI'].iloc[-1]:.2f}
-        Bollinger Bands position: {self._calculate_bb_position(market_data)}
-        """
-
-    def _calculate_bb_position(self, market_data):
-        current_price = market_data['Close'].iloc[-1]
-        upper_band = market_data['Upper_Band'].iloc[-1]
-        lower_band = market_data['Lower_Band'].iloc[-1]
-
-        if current_price > upper_band:
-            return "Above upper band"
-        elif current_price < lower_band:
-            return "Below lower band"
-        else:
-            return "Within bands"
+        close = market_data['Close']
+        return _market_context(
+            close.iat[-1], market_data['Volume'].iat[-1], close.iat[-2],
+            market_data['MACD'].iat[-1], market_data['RSI'].iat[-1],
+            market_data['Upper_Band'].iat[-1], market_data['Lower_Band'].iat[-1]
+        )
 
     def _combine_signals(self, quantitative_signals, llm_response):
         # Parse LLM response and combine with quantitative signals
@@ -62,4 +86,22 @@ class TradingAgent:
             'analysis': llm_response
         }
 
-        return combined_signal
\ No newline at end of file
+        return combined_signal
+
+async def analyze_all(trading_agents, market_data_by_symbol, max_concurrency=8):
+    """Run every strategy agent over every symbol concurrently: {symbol: {strategy: signal}}"""
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def bounded(agent, market_data, symbol):
+        async with semaphore:
+            return await agent.aanalyze(market_data, symbol)
+
+    pairs = [(symbol, name) for symbol in market_data_by_symbol for name in trading_agents]
+    results = await asyncio.gather(*(
+        bounded(trading_agents[name], market_data_by_symbol[symbol], symbol) for symbol, name in pairs
+    ))
+
+    signals = {symbol: {} for symbol in market_data_by_symbol}
+    for (symbol, name), result in zip(pairs, results):
+        signals[symbol][name] = result
+    return signals
@@ -0,0 +1,42 @@
+import os
+import re
+import time
+import pickle
+
+class FileCache:
+    """Pickled values in a directory, one file per key, expired by file age
+
+    Survives restarts and is shared by every process on the host, unlike the in-memory caches.
+    """
+
+    def __init__(self, directory, ttl):
+        self.directory = directory
+        self.ttl = ttl
+
+    def _path(self, key):
+        return os.path.join(self.directory, re.sub(r'[^\w.^=-]', '_', key) + '.pkl')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            print(f"Error reading cache file {path}: {str(e)}")
+            return None
+
+    def set(self, key, value):
+        path = self._path(key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Write beside the target and rename, so concurrent readers never see a partial file
+            tmp_path = f"{path}.{os.getpid()}.{id(value)}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing cache file {path}: {str(e)}")
@@ -0,0 +1,113 @@
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    # Same results without numba, just interpreted
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+# Column order of compute_indicators' output
+INDICATOR_COLUMNS = ['MACD', 'Signal_Line', 'MA20', '20dSTD', 'Upper_Band', 'Lower_Band', 'RSI']
+
+@njit(cache=True)
+def _ewm_mean(values, span):
+    """pandas .ewm(span=span, adjust=False).mean(), including its NaN handling"""
+    alpha = 2.0 / (span + 1.0)
+    out = np.empty(values.size)
+    weighted = values[0]
+    nobs = 0 if np.isnan(weighted) else 1
+    out[0] = weighted if nobs else np.nan
+    old_wt = 1.0
+    for i in range(1, values.size):
+        cur = values[i]
+        is_observation = not np.isnan(cur)
+        if is_observation:
+            nobs += 1
+        if not np.isnan(weighted):
+            old_wt *= 1.0 - alpha
+            if is_observation:
+                if weighted != cur:
+                    weighted = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+                old_wt = 1.0
+        elif is_observation:
+            weighted = cur
+        out[i] = weighted if nobs else np.nan
+    return out
+
+@njit(cache=True)
+def _rolling_mean(values, window):
+    """pandas .rolling(window).mean(): NaN until a full window of observations"""
+    out = np.full(values.size, np.nan)
+    for i in range(window - 1, values.size):
+        total = 0.0
+        for j in range(i - window + 1, i + 1):
+            total += values[j]
+        # A NaN anywhere in the window propagates, matching min_periods=window
+        out[i] = total / window
+    return out
+
+@njit(cache=True)
+def _rolling_std(values, mean, window):
+    """pandas .rolling(window).std() (ddof=1) given the matching rolling mean"""
+    out = np.full(values.size, np.nan)
+    for i in range(window - 1, values.size):
+        squares = 0.0
+        for j in range(i - window + 1, i + 1):
+            squares += (values[j] - mean[i]) ** 2
+        out[i] = np.sqrt(squares / (window - 1))
+    return out
+
+@njit(cache=True, error_model='numpy')
+def compute_indicators(close):
+    """MACD, Bollinger Bands and RSI for a float64 close array, one row per bar"""
+    n = close.size
+    out = np.empty((n, 7))
+    if n == 0:
+        return out
+
+    macd = _ewm_mean(close, 12) - _ewm_mean(close, 26)
+    out[:, 0] = macd
+    out[:, 1] = _ewm_mean(macd, 9)
+
+    ma20 = _rolling_mean(close, 20)
+    std20 = _rolling_std(close, ma20, 20)
+    out[:, 2] = ma20
+    out[:, 3] = std20
+    out[:, 4] = ma20 + std20 * 2
+    out[:, 5] = ma20 - std20 * 2
+
+    # 14-bar simple average of gains/losses; a NaN delta counts as no move, as with Series.where
+    gains = np.zeros(n)
+    losses = np.zeros(n)
+    for i in range(1, n):
+        delta = close[i] - close[i - 1]
+        if delta > 0:
+            gains[i] = delta
+        elif delta < 0:
+            losses[i] = -delta
+    avg_gain = _rolling_mean(gains, 14)
+    avg_loss = _rolling_mean(losses, 14)
+    out[:, 6] = 100 - (100 / (1 + avg_gain / avg_loss))
+    return out
+
+def compute_indicators_talib(close):
+    """TA-Lib version of compute_indicators, same column order
+
+    Values differ slightly from the default kernel: TA-Lib seeds the MACD EMAs with an SMA,
+    uses population std for the bands and Wilder smoothing for RSI.
+    """
+    import talib
+    macd, signal, _ = talib.MACD(close, fastperiod=12, slowperiod=26, signalperiod=9)
+    upper, middle, lower = talib.BBANDS(close, timeperiod=20, nbdevup=2, nbdevdn=2)
+    rsi = talib.RSI(close, timeperiod=14)
+    return np.column_stack([macd, signal, middle, (upper - middle) / 2, upper, lower, rsi])
+
+@njit(cache=True)
+def portfolio_pnl(current_price, entry_price, quantity):
+    """Sum of (current - entry) * quantity over positions; a NaN current price contributes nothing"""
+    total = 0.0
+    for i in range(current_price.shape[0]):
+        if not np.isnan(current_price[i]):
+            total += (current_price[i] - entry_price[i]) * quantity[i]
+    return total
@@ -1,50 +1,171 @@
 import yfinance as yf
 import pandas as pd
 import quandl
-from datetime import datetime, timedelta
+import numpy as np
+from data.indicators import INDICATOR_COLUMNS, compute_indicators, compute_indicators_talib
+from data.file_cache import FileCache
+import os
+from cachetools import TTLCache
+import threading
+import asyncio
+
+try:
+    import requests_cache
+except ImportError:
+    requests_cache = None
+
+def _http_session():
+    """Yahoo responses cached on disk and shared by every process, if requests_cache is installed"""
+    if requests_cache is None:
+        return None
+    return requests_cache.CachedSession(
+        os.getenv('YFINANCE_CACHE', '.cache/yfin'),
+        backend='sqlite',
+        expire_after=int(os.getenv('YFINANCE_CACHE_TTL', 3600)),
+        allowable_methods=('GET', 'POST')
+    )
+
+# One session per process: Streamlit reruns rebuild MarketData but keep the module
+HTTP_SESSION = _http_session()
 
 class MarketData:
+    # Symbols per yf.download request; larger batches get throttled or truncated by Yahoo
+    BATCH_SIZE = 20
+    # Company names practically never change, so keep them for 30 days
+    COMPANY_NAME_TTL = 30 * 24 * 3600
+
     def __init__(self):
-        self.cache = {}
         self.cache_timeout = 300  # 5 minutes
+        # Bounded, monotonic-clock expiry; the lock guards it for threaded callers
+        self.cache = TTLCache(maxsize=1024, ttl=self.cache_timeout)
+        self.cache_lock = threading.RLock()
+        # Second tier on disk, so restarts and other processes reuse recent fetches
+        self.file_cache = FileCache(os.getenv('MARKET_DATA_CACHE', '.cache/market_data'), ttl=self.cache_timeout)
+        self.company_names = FileCache(os.getenv('COMPANY_NAME_CACHE', '.cache/company_names'), ttl=self.COMPANY_NAME_TTL)
+        # None falls back to yfinance's own uncached session
+        self.session = HTTP_SESSION
+        self.compute_indicators = self._select_indicator_backend(os.getenv('INDICATOR_BACKEND', 'numba'))
 
     def get_stock_data(self, symbol, period='1mo', interval='1d'):
         cache_key = f"{symbol}_{period}_{interval}"
 
         # Check cache first
-        if cache_key in self.cache:
-            data, timestamp = self.cache[cache_key]
-            if datetime.now() - timestamp < timedelta(seconds=self.cache_timeout):
-                return data
+        data = self._cache_get(cache_key)
+        if data is not None:
+            return data
 
         try:
             # Fetch new data
-            stock = yf.Ticker(symbol)
+            stock = yf.Ticker(symbol, session=self.session)
             data = stock.history(period=period, interval=interval)
 
             # Ensure we have data
             if data.empty:
                 return pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+            data = self._compact_prices(data)
 
             # Cache the result
-            self.cache[cache_key] = (data, datetime.now())
+            self._cache_set(cache_key, data)
 
             return data
         except Exception as e:
             print(f"Error fetching data for {symbol}: {str(e)}")
             return pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'])
 
+    def get_company_name(self, symbol):
+        """The company's long name, or the symbol if Yahoo doesn't know it
+
+        Ticker.info is Yahoo's slowest endpoint, so names are cached on disk.
+        """
+        name = self.company_names.get(symbol)
+        if name is not None:
+            return name
+        try:
+            name = yf.Ticker(symbol, session=self.session).info.get('longName')
+        except Exception as e:
+            print(f"Error fetching company name for {symbol}: {str(e)}")
+            return symbol
+        if not name:
+            return symbol
+        self.company_names.set(symbol, name)
+        return name
+
+    def get_many(self, symbols, period='1mo', interval='1d'):
+        """Fetch several symbols with one batched Yahoo request per BATCH_SIZE symbols: {symbol: DataFrame}"""
+        results = {}
+        misses = []
+        for symbol in symbols:
+            data = self._cache_get(f"{symbol}_{period}_{interval}")
+            if data is not None:
+                results[symbol] = data
+            else:
+                misses.append(symbol)
+
+        for start in range(0, len(misses), self.BATCH_SIZE):
+            batch = misses[start:start + self.BATCH_SIZE]
+            try:
+                downloaded = yf.download(
+                    tickers=" ".join(batch), period=period, interval=interval,
+                    group_by='ticker', auto_adjust=True, threads=True, progress=False,
+                    session=self.session
+                )
+            except Exception as e:
+                print(f"Error fetching data for {', '.join(batch)}: {str(e)}")
+                downloaded = pd.DataFrame()
+
+            for symbol in batch:
+                data = self._split_download(downloaded, symbol)
+                if data.empty:
+                    results[symbol] = pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+                    continue
+                self._cache_set(f"{symbol}_{period}_{interval}", data)
+                results[symbol] = data
+
+        return {symbol: results[symbol] for symbol in symbols}
+
+    def _cache_get(self, cache_key):
+        """Memory first, then disk; a disk hit is promoted to memory"""
+        with self.cache_lock:
+            data = self.cache.get(cache_key)
+        if data is None:
+            data = self.file_cache.get(cache_key)
+            if data is not None:
+                with self.cache_lock:
+                    self.cache[cache_key] = data
+        return data
+
+    def _cache_set(self, cache_key, data):
+        with self.cache_lock:
+            self.cache[cache_key] = data
+        self.file_cache.set(cache_key, data)
+
+    async def aget_many(self, symbols, period='1mo', interval='1d'):
+        """get_many off the event loop, so it can overlap with the async agent calls"""
+        return await asyncio.to_thread(self.get_many, symbols, period, interval)
+
+    def _split_download(self, downloaded, symbol):
+        # yf.download keys columns by (ticker, field); drop the dates only other tickers traded
+        if not isinstance(downloaded.columns, pd.MultiIndex) or symbol not in downloaded.columns.get_level_values(0):
+            return pd.DataFrame()
+        return self._compact_prices(downloaded[symbol].dropna(how='all'))
+
+    def _compact_prices(self, data):
+        # float32 is ample for prices and halves the bytes every indicator pass reads;
+        # Volume stays int64 since heavy names trade more than int32 can hold
+        return data.astype({column: np.float32 for column in ('Open', 'High', 'Low', 'Close') if column in data})
+
     def get_quandl_data(self, dataset_code, start_date, end_date):
         cache_key = f"quandl_{dataset_code}_{start_date}_{end_date}"
 
-        if cache_key in self.cache:
-            data, timestamp = self.cache[cache_key]
-            if datetime.now() - timestamp < timedelta(seconds=self.cache_timeout):
-                return data
+        with self.cache_lock:
+            data = self.cache.get(cache_key)
+        if data is not None:
+            return data
 
         try:
             data = quandl.get(dataset_code, start_date=start_date, end_date=end_date)
-            self.cache[cache_key] = (data, datetime.now())
+            with self.cache_lock:
+                self.cache[cache_key] = data
             return data
         except Exception as e:
             print(f"Error fetching Quandl data: {str(e)}")
@@ -55,26 +176,18 @@ class MarketData:
             return df
 
         try:
-            # MACD
-            exp1 = df['Close'].ewm(span=12, adjust=False).mean()
-            exp2 = df['Close'].ewm(span=26, adjust=False).mean()
-            df['MACD'] = exp1 - exp2
-            df['Signal_Line'] = df['MACD'].ewm(span=9, adjust=False).mean()
-
-            # Bollinger Bands
-            df['MA20'] = df['Close'].rolling(window=20).mean()
-            df['20dSTD'] = df['Close'].rolling(window=20).std()
-            df['Upper_Band'] = df['MA20'] + (df['20dSTD'] * 2)
-            df['Lower_Band'] = df['MA20'] - (df['20dSTD'] * 2)
-
-            # RSI
-            delta = df['Close'].diff()
-            gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-            rs = gain / loss
-            df['RSI'] = 100 - (100 / (1 + rs))
-
+            # MACD, Bollinger Bands and RSI in one compiled pass over the closes
+            df[INDICATOR_COLUMNS] = self.compute_indicators(df['Close'].to_numpy(dtype=np.float64))
             return df
         except Exception as e:
             print(f"Error calculating technical indicators: {str(e)}")
-            return df
\ No newline at end of file
+            return df
+
+    def _select_indicator_backend(self, backend):
+        if backend == 'talib':
+            try:
+                import talib
+                return compute_indicators_talib
+            except ImportError:
+                print("INDICATOR_BACKEND=talib but TA-Lib is not installed, using the numba kernel")
+        return compute_indicators
@@ -1,257 +1,961 @@
 import os
+import io
+import pickle
+import csv
+import time
+import random
+import atexit
+import threading
+import warnings
 import psycopg2
-from psycopg2.extras import RealDictCursor
+import psycopg2.errors
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+from psycopg2 import errorcodes
+from psycopg2.extensions import adapt, connection, register_adapter
+import numpy as np
+from collections import deque
+from cachetools import TTLCache
+from contextlib import contextmanager
 from datetime import datetime
+from typing import NamedTuple, Optional
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Market data prices are float32, which psycopg2 cannot adapt on its own
+register_adapter(np.float32, lambda value: adapt(float(value)))
+
+# Conflicts worth backing off for; anything else that isn't a dropped connection is raised
+_CONTENTION_PGCODES = {
+    errorcodes.DEADLOCK_DETECTED, errorcodes.SERIALIZATION_FAILURE, errorcodes.LOCK_NOT_AVAILABLE
+}
+
+# Bump whenever SCHEMA changes so existing databases rerun it
+SCHEMA_VERSION = 4
+
+# Idempotent DDL run by create_tables, in order
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER NOT NULL
+    )
+    """,
+    # Keep existing sequences
+    """
+    CREATE SEQUENCE IF NOT EXISTS portfolio_id_seq;
+    CREATE SEQUENCE IF NOT EXISTS trading_signals_id_seq;
+    CREATE SEQUENCE IF NOT EXISTS watchlist_stocks_id_seq;
+    CREATE SEQUENCE IF NOT EXISTS trading_decisions_id_seq;
+    """,
+    # Keep existing tables
+    """
+    CREATE TABLE IF NOT EXISTS portfolio (
+        id INTEGER PRIMARY KEY DEFAULT nextval('portfolio_id_seq'),
+        symbol VARCHAR(10) NOT NULL,
+        quantity INTEGER NOT NULL,
+        entry_price FLOAT NOT NULL,
+        entry_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        exit_price FLOAT,
+        exit_date TIMESTAMP,
+        strategy VARCHAR(50) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS trading_signals (
+        id INTEGER PRIMARY KEY DEFAULT nextval('trading_signals_id_seq'),
+        symbol VARCHAR(10) NOT NULL,
+        signal_type VARCHAR(10) NOT NULL,
+        strategy VARCHAR(50) NOT NULL,
+        confidence FLOAT NOT NULL,
+        timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    # Tables created before the timestamp columns had defaults
+    """
+    ALTER TABLE portfolio ALTER COLUMN entry_date SET DEFAULT CURRENT_TIMESTAMP;
+    ALTER TABLE trading_signals ALTER COLUMN timestamp SET DEFAULT CURRENT_TIMESTAMP;
+    """,
+    # Screener output is rebuilt every cycle, so it skips the WAL; a crash just empties it
+    """
+    CREATE UNLOGGED TABLE IF NOT EXISTS screened_stocks (
+        id SERIAL PRIMARY KEY,
+        symbol VARCHAR(10) NOT NULL,
+        company_name VARCHAR(100),
+        current_price DECIMAL(10, 2) NOT NULL,
+        average_volume BIGINT NOT NULL,
+        last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(symbol)
+    )
+    """,
+    """
+    ALTER TABLE screened_stocks SET UNLOGGED;
+    """,
+    # Update watchlist_stocks table to include entry and exit prices
+    """
+    CREATE TABLE IF NOT EXISTS watchlist_stocks (
+        id SERIAL PRIMARY KEY,
+        symbol VARCHAR(10) NOT NULL UNIQUE,
+        notes TEXT,
+        added_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        entry_price DECIMAL(10, 2),
+        exit_price DECIMAL(10, 2),
+        last_signal_type VARCHAR(10),
+        signal_timestamp TIMESTAMP
+    )
+    """,
+    # Add new table for trading decisions
+    """
+    CREATE TABLE IF NOT EXISTS trading_decisions (
+        id SERIAL PRIMARY KEY,
+        symbol VARCHAR(10) NOT NULL,
+        decision TEXT NOT NULL,
+        confidence FLOAT NOT NULL,
+        agent_name VARCHAR(50) NOT NULL DEFAULT 'supervisor',
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        created_on DATE GENERATED ALWAYS AS (created_at::date) STORED
+    )
+    """,
+    # One decision per symbol, agent and day, on a plain column instead of an expression index
+    """
+    ALTER TABLE trading_decisions
+    ADD COLUMN IF NOT EXISTS created_on DATE GENERATED ALWAYS AS (created_at::date) STORED;
+    DROP INDEX IF EXISTS trading_decisions_daily_idx;
+    CREATE UNIQUE INDEX IF NOT EXISTS trading_decisions_daily_agent_idx
+    ON trading_decisions (symbol, agent_name, created_on);
+    """,
+    # Serve the per-agent latest-decision window and the latest-N scan from indexes
+    """
+    CREATE INDEX IF NOT EXISTS trading_decisions_symbol_agent_time_idx
+    ON trading_decisions (symbol, agent_name, created_at DESC);
+    CREATE INDEX IF NOT EXISTS trading_decisions_symbol_time_idx
+    ON trading_decisions (symbol, created_at DESC);
+    """,
+    # Signal history per symbol and the screener TTL purge
+    """
+    CREATE INDEX IF NOT EXISTS trading_signals_symbol_time_idx
+    ON trading_signals (symbol, timestamp DESC);
+    CREATE INDEX IF NOT EXISTS screened_stocks_last_updated_idx
+    ON screened_stocks (last_updated);
+    """,
+    # Open positions are served by an index-only scan over just the open rows
+    """
+    DROP INDEX IF EXISTS portfolio_open_idx;
+    CREATE INDEX IF NOT EXISTS open_positions_idx
+    ON portfolio (id) INCLUDE (symbol, quantity, entry_price, entry_date, strategy)
+    WHERE exit_date IS NULL;
+    """,
+]
+
+_SCHEMA_TABLES = (
+    'portfolio', 'trading_signals', 'screened_stocks', 'watchlist_stocks', 'trading_decisions', 'schema_version'
+)
+_SCHEMA_SEQUENCES = (
+    'portfolio_id_seq', 'trading_signals_id_seq', 'watchlist_stocks_id_seq', 'trading_decisions_id_seq'
+)
+
+# Statements used by Database, hoisted so each text is built once and stays identical across calls
+# Row types for the hot list reads: tuples are smaller than dicts, and module-level types pickle
+class OpenPosition(NamedTuple):
+    id: int
+    symbol: str
+    quantity: int
+    entry_price: float
+    entry_date: datetime
+    exit_price: Optional[float]
+    exit_date: Optional[datetime]
+    strategy: str
+
+class ScreenedStock(NamedTuple):
+    id: int
+    symbol: str
+    company_name: Optional[str]
+    current_price: float
+    average_volume: int
+    last_updated: datetime
+
+class WatchlistStock(NamedTuple):
+    id: int
+    symbol: str
+    notes: Optional[str]
+    added_date: datetime
+    entry_price: Optional[float]
+    exit_price: Optional[float]
+    last_signal_type: Optional[str]
+    signal_timestamp: Optional[datetime]
+
+_SQL_SELECT_SCHEMA_VERSION = """
+    SELECT version FROM schema_version
+"""
+
+# Held until the migration commits, so workers starting together apply the schema once
+_SQL_LOCK_SCHEMA = """
+    SELECT pg_advisory_xact_lock(hashtext('trading_schema'))
+"""
+
+_SQL_SCHEMA_VERSION_TABLE = """
+    SELECT to_regclass('schema_version')
+"""
+
+_SQL_SET_SCHEMA_VERSION = """
+    DELETE FROM schema_version;
+    INSERT INTO schema_version (version) VALUES (%s)
+"""
+
+_SQL_INSERT_POSITION = """
+    INSERT INTO portfolio (symbol, quantity, entry_price, strategy, entry_date)
+    VALUES ($1, $2, $3, $4, COALESCE($5::timestamp, LOCALTIMESTAMP))
+    RETURNING id
+"""
+
+_SQL_CLOSE_POSITION = """
+    UPDATE portfolio
+    SET exit_price = $1, exit_date = COALESCE($2::timestamp, LOCALTIMESTAMP)
+    WHERE id = $3
+"""
+
+# Only open_positions_idx columns, so the heap is never visited; the exit columns are NULL by definition
+_SQL_SELECT_OPEN_POSITIONS = """
+    SELECT id, symbol, quantity, entry_price, entry_date,
+           NULL::float AS exit_price, NULL::timestamp AS exit_date, strategy
+    FROM portfolio
+    WHERE exit_date IS NULL
+"""
+
+_SQL_INSERT_SIGNALS = """
+    INSERT INTO trading_signals
+    (symbol, signal_type, strategy, confidence)
+    VALUES %s
+"""
+
+# The signal rides along in a CTE so both rows are written in a single round trip
+_SQL_INSERT_DECISION_AND_SIGNAL = """
+    WITH signal AS (
+        INSERT INTO trading_signals (symbol, signal_type, strategy, confidence)
+        VALUES (%(symbol)s, %(signal_type)s, %(strategy)s, %(confidence)s)
+    )
+    INSERT INTO trading_decisions (symbol, decision, confidence, agent_name)
+    VALUES (%(symbol)s, %(decision)s, %(confidence)s, %(agent_name)s)
+    ON CONFLICT (symbol, agent_name, created_on) DO UPDATE SET
+        decision = EXCLUDED.decision,
+        confidence = EXCLUDED.confidence,
+        created_at = EXCLUDED.created_at
+"""
+
+_SQL_UPSERT_SCREENED_VALUES = """
+    INSERT INTO screened_stocks
+    (symbol, company_name, current_price, average_volume)
+    VALUES %s
+    ON CONFLICT (symbol)
+    DO UPDATE SET
+        company_name = EXCLUDED.company_name,
+        current_price = EXCLUDED.current_price,
+        average_volume = EXCLUDED.average_volume,
+        last_updated = CURRENT_TIMESTAMP
+"""
+
+_SQL_CREATE_SCREENED_LOAD = """
+    CREATE TEMP TABLE screened_stocks_load
+    (LIKE screened_stocks INCLUDING DEFAULTS) ON COMMIT DROP
+"""
+
+_SQL_COPY_SCREENED_LOAD = """
+    COPY screened_stocks_load (symbol, company_name, current_price, average_volume)
+    FROM STDIN WITH (FORMAT csv)
+"""
+
+_SQL_UPSERT_SCREENED_FROM_LOAD = """
+    INSERT INTO screened_stocks
+    (symbol, company_name, current_price, average_volume)
+    SELECT symbol, company_name, current_price, average_volume
+    FROM screened_stocks_load
+    ON CONFLICT (symbol)
+    DO UPDATE SET
+        company_name = EXCLUDED.company_name,
+        current_price = EXCLUDED.current_price,
+        average_volume = EXCLUDED.average_volume,
+        last_updated = CURRENT_TIMESTAMP
+"""
+
+# Straight into the table: only valid right after a TRUNCATE, when no symbol can conflict
+_SQL_COPY_SCREENED = """
+    COPY screened_stocks (symbol, company_name, current_price, average_volume)
+    FROM STDIN WITH (FORMAT csv)
+"""
+
+_SQL_TRUNCATE_SCREENED = """
+    TRUNCATE screened_stocks
+"""
+
+_SQL_SELECT_SCREENED = """
+    SELECT id, symbol, company_name, current_price, average_volume, last_updated
+    FROM screened_stocks
+    ORDER BY symbol ASC
+"""
+
+_SQL_DELETE_OLD_SCREENED = """
+    DELETE FROM screened_stocks
+    WHERE last_updated < NOW() - make_interval(hours => $1)
+"""
+
+_SQL_UPSERT_WATCHLIST = """
+    INSERT INTO watchlist_stocks (symbol, notes, entry_price, exit_price)
+    VALUES (%s, %s, %s, %s)
+    ON CONFLICT (symbol) DO UPDATE SET
+        notes = EXCLUDED.notes,
+        entry_price = EXCLUDED.entry_price,
+        exit_price = EXCLUDED.exit_price,
+        added_date = CURRENT_TIMESTAMP
+"""
+
+_SQL_UPDATE_WATCHLIST_SIGNAL = """
+    UPDATE watchlist_stocks
+    SET last_signal_type = $1,
+        signal_timestamp = CURRENT_TIMESTAMP
+    WHERE symbol = $2
+"""
+
+_SQL_DELETE_WATCHLIST = """
+    DELETE FROM watchlist_stocks
+    WHERE symbol = %s
+"""
+
+_SQL_SELECT_WATCHLIST = """
+    SELECT id, symbol, notes, added_date, entry_price, exit_price, last_signal_type, signal_timestamp
+    FROM watchlist_stocks
+    ORDER BY added_date DESC
+"""
+
+_SQL_SELECT_LATEST_DECISIONS = """
+    SELECT decision, confidence, agent_name, created_at
+    FROM trading_decisions
+    WHERE symbol = $1
+    ORDER BY created_at DESC
+    LIMIT $2
+"""
+
+# A later decision from the same agent on the same day replaces the earlier one
+_SQL_INSERT_DECISIONS = """
+    INSERT INTO trading_decisions (symbol, decision, confidence, agent_name)
+    VALUES %s
+    ON CONFLICT (symbol, agent_name, created_on) DO UPDATE SET
+        decision = EXCLUDED.decision,
+        confidence = EXCLUDED.confidence,
+        created_at = EXCLUDED.created_at
+"""
+
+# DISTINCT ON walks the (symbol, agent_name, created_at DESC) index, no window sort
+_SQL_SELECT_ALL_AGENT_DECISIONS = """
+    SELECT DISTINCT ON (agent_name) symbol, decision, confidence, agent_name, created_at
+    FROM trading_decisions
+    WHERE symbol = $1
+    ORDER BY agent_name, created_at DESC
+"""
+
+_SQL_SELECT_LATEST_DECISIONS_BULK = """
+    SELECT d.symbol, d.decision, d.confidence, d.agent_name, d.created_at
+    FROM unnest(%s::text[]) AS s(symbol)
+    CROSS JOIN LATERAL (
+        SELECT symbol, decision, confidence, agent_name, created_at
+        FROM trading_decisions
+        WHERE symbol = s.symbol
+        ORDER BY created_at DESC
+        LIMIT %s
+    ) d
+    ORDER BY d.symbol, d.created_at DESC
+"""
+
+_SQL_SELECT_AGENT_DECISIONS_BULK = """
+    SELECT d.symbol, d.decision, d.confidence, d.agent_name, d.created_at
+    FROM (
+        SELECT DISTINCT symbol, agent_name
+        FROM trading_decisions
+        WHERE symbol = ANY(%s)
+    ) a
+    CROSS JOIN LATERAL (
+        SELECT symbol, decision, confidence, agent_name, created_at
+        FROM trading_decisions
+        WHERE symbol = a.symbol AND agent_name = a.agent_name
+        ORDER BY created_at DESC
+        LIMIT %s
+    ) d
+    ORDER BY d.symbol, d.agent_name, d.created_at DESC
+"""
+
+_SQL_SELECT_LATEST_POSITION_ID = """
+    SELECT id FROM portfolio
+    WHERE symbol = %s
+    ORDER BY entry_date DESC
+    LIMIT 1
+"""
+
+class _PreparingConnection(connection):
+    """Connection that remembers the server-side prepared statements it holds"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+        # Plain cursor reused by every tuple-row operation on this connection
+        self.app_cursor = None
+
+    def reusable_cursor(self):
+        if self.app_cursor is None or self.app_cursor.closed:
+            self.app_cursor = self.cursor()
+        return self.app_cursor
+
+    def discard_cursor(self):
+        if self.app_cursor is not None:
+            self.app_cursor.close()
+            self.app_cursor = None
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def _shared_pool(max_connections):
+    """The process-wide pool for the configured database; the first caller sets its size
+
+    Streamlit reruns construct a new Database every time, and each used to open its own pool.
+    """
+    dsn = {
+        'host': os.environ['PGHOST'],
+        'database': os.environ['PGDATABASE'],
+        'user': os.environ['PGUSER'],
+        'password': os.environ['PGPASSWORD'],
+        'port': os.environ['PGPORT']
+    }
+    key = tuple(sorted(dsn.items()))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.closed:
+            pool = _pools[key] = ThreadedConnectionPool(
+                2, max_connections,
+                connection_factory=_PreparingConnection,
+                # TCP keepalives stop idle pooled connections being dropped silently by NAT/firewalls
+                keepalives=1,
+                keepalives_idle=30,
+                keepalives_interval=10,
+                keepalives_count=5,
+                **dsn
+            )
+        return pool
+
+def _redis_client():
+    """Shared read cache for every app process, if REDIS_URL is set and redis is installed"""
+    url = os.getenv('REDIS_URL')
+    if not url:
+        return None
+    if redis is None:
+        print("REDIS_URL is set but redis is not installed, using the in-process cache")
+        return None
+    return redis.Redis.from_url(url)
 
 class Database:
-    def __init__(self):
-        self.conn = psycopg2.connect(
-            host=os.environ['PGHOST'],
-            database=os.environ['PGDATABASE'],
-            user=os.environ['PGUSER'],
-            password=os.environ['PGPASSWORD'],
-            port=os.environ['PGPORT']
-        )
+    # Buffered signals/decisions are written every FLUSH_INTERVAL seconds or once FLUSH_THRESHOLD queue up
+    FLUSH_INTERVAL = 2
+    FLUSH_THRESHOLD = 500
+    # Screener batches at least this large are loaded with COPY instead of multi-row INSERTs
+    COPY_THRESHOLD = 500
+    # Set once this process has checked or applied the schema, so later instances skip the DDL
+    _schema_ready = False
+    # How long to wait for a free pooled connection before giving up, in seconds
+    CHECKOUT_TIMEOUT = 10
+    # Lifetime of cached reads in Redis, in seconds
+    REDIS_TTL = int(os.getenv('REDIS_CACHE_TTL', 10))
+
+    def __init__(self, max_connections=None):
+        # Pooled so concurrent callers (agent threads, Streamlit sessions) don't share one connection
+        self.pool = _shared_pool(max_connections or int(os.getenv('DB_POOL_SIZE', 16)))
         self.create_tables()
 
+        # Short-lived read cache; writes drop the entries for the table they touch
+        self._cache = TTLCache(maxsize=32, ttl=30)
+        self._cache_lock = threading.RLock()
+        # With Redis the cache is shared, so one session's write is seen by every other process
+        self._redis = _redis_client()
+        # Per-operation retry delays for execute_with_retry, in seconds
+        self._backoff = {}
+
+        # Write-behind buffers: callers append and return, a daemon thread does the INSERTs
+        self._signal_buf = deque()
+        self._decision_buf = deque()
+        self._flush_lock = threading.Lock()
+        self._flush_wanted = threading.Event()
+        threading.Thread(target=self._flush_loop, daemon=True).start()
+        atexit.register(self.flush)
+
+    def _getconn(self):
+        """Check out a pooled connection, waiting for one to be returned if all are in use"""
+        deadline = time.monotonic() + self.CHECKOUT_TIMEOUT
+        while True:
+            try:
+                return self.pool.getconn()
+            except PoolError:
+                # ThreadedConnectionPool raises instead of blocking when exhausted
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.05)
+
+    @contextmanager
+    def _cursor(self, cursor_factory=None):
+        """Borrow a pooled connection; commit on success, roll back on error"""
+        conn = self._getconn()
+        try:
+            if cursor_factory is None:
+                yield conn.reusable_cursor()
+            else:
+                with conn.cursor(cursor_factory=cursor_factory) as cur:
+                    yield cur
+            conn.commit()
+        except Exception:
+            # Don't carry a cursor that saw the failure over to the next borrower
+            conn.discard_cursor()
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            # A connection the server dropped is discarded rather than handed out again
+            self.pool.putconn(conn, close=bool(conn.closed))
+
+    @contextmanager
+    def transaction(self):
+        """Group several writes into one commit: pass the yielded cursor as cur= to each write"""
+        # Queued rows are older than anything written here; flushing later from another
+        # connection could block on rows this transaction has locked
+        self.flush()
+        with self._cursor() as cur:
+            yield cur
+        # The writes invalidated their tables before the commit, so drop anything cached meanwhile
+        self._clear_cache()
+
+    @contextmanager
+    def _writer(self, cur=None):
+        """The caller's transaction cursor if given, otherwise a fresh one committed on exit"""
+        if cur is not None:
+            yield cur
+            return
+        with self._cursor() as cur:
+            yield cur
+
+    def _execute_prepared(self, cur, name, statement, params):
+        """Run statement ($1.. placeholders) as prepared statement name, preparing it once per connection
+
+        Prepared statements outlive transactions, including rolled back ones, so the set stays accurate.
+        """
+        if name not in cur.connection.prepared:
+            cur.execute(f"PREPARE {name} AS {statement}")
+            cur.connection.prepared.add(name)
+        if params:
+            cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+        else:
+            cur.execute(f"EXECUTE {name}")
+
+    def _stream(self, query, params=None, chunk=1000, record=None):
+        """Yield rows through a named (server-side) cursor, chunk rows per round trip
+
+        Rows are record instances if a NamedTuple type is given, dicts otherwise.
+        """
+        conn = self._getconn()
+        try:
+            # The connection is ours until the generator finishes, so a fixed cursor name can't clash
+            with conn.cursor('app_stream', cursor_factory=None if record else RealDictCursor) as cur:
+                # Iterating a named cursor pulls itersize rows per FETCH from the open portal
+                cur.itersize = chunk
+                cur.execute(query, params)
+                yield from map(record._make, cur) if record else cur
+            conn.commit()
+        except BaseException:
+            # Includes GeneratorExit when the caller stops iterating early
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self.pool.putconn(conn, close=bool(conn.closed))
+
+    def execute_with_retry(self, operation, cursor_factory=None, retries=3, name=None):
+        """Run operation(cur) on a pooled connection, retrying dropped connections and lock conflicts
+
+        A dropped connection is retried at once on a fresh one; deadlocks and serialization or lock
+        timeouts back off for a per-operation delay that grows on conflict and shrinks on success.
+        Only pass idempotent operations: a write may have reached the server before the drop.
+        """
+        name = name or operation.__qualname__
+        for attempt in range(retries + 1):
+            try:
+                with self._cursor(cursor_factory) as cur:
+                    result = operation(cur)
+                self._adjust_backoff(name, 1 / 1.2)
+                return result
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                # Server-side errors carry a SQLSTATE; a dropped connection doesn't
+                contention = e.pgcode in _CONTENTION_PGCODES
+                if attempt == retries or not (contention or e.pgcode is None):
+                    raise
+                if contention:
+                    delay = self._adjust_backoff(name, 1.5)
+                    print(f"Database contention in {name}, retrying in {delay:.2f}s: {str(e)}")
+                    time.sleep(delay * random.uniform(0.5, 1.5))
+                else:
+                    print(f"Database connection lost, retrying: {str(e)}")
+
+    def _adjust_backoff(self, name, factor):
+        """Scale the retry delay of name by factor within [0.01, 5] seconds and return it"""
+        with self._cache_lock:
+            delay = min(max(self._backoff.get(name, 0.05) * factor, 0.01), 5.0)
+            self._backoff[name] = delay
+        return delay
+
+    @staticmethod
+    def _redis_key(key):
+        return 'td:' + ':'.join(map(str, key))
+
+    def _cached(self, key, fetch):
+        """Return the cached rows for key, fetching them on a miss; key[0] names the table"""
+        if self._redis is not None:
+            return self._redis_cached(key, fetch)
+        with self._cache_lock:
+            if key in self._cache:
+                return self._cache[key]
+        rows = fetch()
+        with self._cache_lock:
+            self._cache[key] = rows
+        return rows
+
+    def _redis_cached(self, key, fetch):
+        redis_key = self._redis_key(key)
+        try:
+            cached = self._redis.get(redis_key)
+        except redis.RedisError as e:
+            print(f"Error reading from Redis cache: {str(e)}")
+            return fetch()
+        if cached is not None:
+            return pickle.loads(cached)
+        rows = fetch()
+        try:
+            self._redis.setex(redis_key, self.REDIS_TTL, pickle.dumps(rows))
+        except redis.RedisError as e:
+            print(f"Error writing to Redis cache: {str(e)}")
+        return rows
+
+    def _invalidate(self, table, symbol=None):
+        """Drop cached reads of table, or only those for symbol"""
+        if self._redis is not None:
+            self._redis_delete(self._redis_key((table,) if symbol is None else (table, symbol)))
+            return
+        with self._cache_lock:
+            for key in [k for k in self._cache if k[0] == table and (symbol is None or k[1] == symbol)]:
+                self._cache.pop(key, None)
+
+    def _redis_delete(self, prefix):
+        """Delete the Redis key prefix and every key nested under it"""
+        try:
+            keys = [prefix, *self._redis.scan_iter(match=prefix + ':*')]
+            self._redis.delete(*keys)
+        except redis.RedisError as e:
+            print(f"Error invalidating Redis cache: {str(e)}")
+
+    def _clear_cache(self):
+        if self._redis is not None:
+            self._redis_delete('td')
+            return
+        with self._cache_lock:
+            self._cache.clear()
+
+    def _flush_loop(self):
+        while True:
+            self._flush_wanted.wait(self.FLUSH_INTERVAL)
+            self._flush_wanted.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing buffered writes: {str(e)}")
+
+    def _enqueue(self, buf, row):
+        buf.append(row)
+        if len(buf) >= self.FLUSH_THRESHOLD:
+            self._flush_wanted.set()
+
+    def flush(self):
+        """Write all buffered signals and decisions in one transaction
+
+        Rows are stamped by the server when they are written, like every other insert,
+        so created_at and the daily upsert key come from a single clock.
+        """
+        with self._flush_lock:
+            signals = [self._signal_buf.popleft() for _ in range(len(self._signal_buf))]
+            decisions = [self._decision_buf.popleft() for _ in range(len(self._decision_buf))]
+            if not signals and not decisions:
+                return
+            try:
+                with self._cursor() as cur:
+                    if signals:
+                        execute_values(cur, _SQL_INSERT_SIGNALS, signals, page_size=500)
+                    if decisions:
+                        # One statement can't upsert a row twice, so keep the last decision per agent
+                        latest = {(row[0], row[3]): row for row in decisions}
+                        execute_values(cur, _SQL_INSERT_DECISIONS, list(latest.values()), page_size=500)
+            except Exception:
+                # Requeue ahead of anything buffered meanwhile so the next flush retries in order
+                self._signal_buf.extendleft(reversed(signals))
+                self._decision_buf.extendleft(reversed(decisions))
+                raise
+        # Reads cached before the commit, here or in another process via Redis, are now stale
+        for symbol in {row[0] for row in decisions}:
+            self._invalidate('trading_decisions', symbol)
+
     def create_tables(self):
-        with self.conn.cursor() as cur:
+        """Bring the schema to SCHEMA_VERSION; a no-op once this process or the database has it"""
+        if Database._schema_ready or self._schema_version() == SCHEMA_VERSION:
+            Database._schema_ready = True
+            return
+        with self._cursor() as cur:
             try:
-                # Keep existing sequences
-                cur.execute("""
-                    CREATE SEQUENCE IF NOT EXISTS portfolio_id_seq;
-                    CREATE SEQUENCE IF NOT EXISTS trading_signals_id_seq;
-                    CREATE SEQUENCE IF NOT EXISTS watchlist_stocks_id_seq;
-                    CREATE SEQUENCE IF NOT EXISTS trading_decisions_id_seq;
-                """)
-
-                # Keep existing tables
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS portfolio (
-                        id INTEGER PRIMARY KEY DEFAULT nextval('portfolio_id_seq'),
-                        symbol VARCHAR(10) NOT NULL,
-                        quantity INTEGER NOT NULL,
-                        entry_price FLOAT NOT NULL,
-                        entry_date TIMESTAMP NOT NULL,
-                        exit_price FLOAT,
-                        exit_date TIMESTAMP,
-                        strategy VARCHAR(50) NOT NULL
-                    )
-                """)
-
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS trading_signals (
-                        id INTEGER PRIMARY KEY DEFAULT nextval('trading_signals_id_seq'),
-                        symbol VARCHAR(10) NOT NULL,
-                        signal_type VARCHAR(10) NOT NULL,
-                        strategy VARCHAR(50) NOT NULL,
-                        confidence FLOAT NOT NULL,
-                        timestamp TIMESTAMP NOT NULL
-                    )
-                """)
-
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS screened_stocks (
-                        id SERIAL PRIMARY KEY,
-                        symbol VARCHAR(10) NOT NULL,
-                        company_name VARCHAR(100),
-                        current_price DECIMAL(10, 2) NOT NULL,
-                        average_volume BIGINT NOT NULL,
-                        last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        UNIQUE(symbol)
-                    )
-                """)
-
-                # Update watchlist_stocks table to include entry and exit prices
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS watchlist_stocks (
-                        id SERIAL PRIMARY KEY,
-                        symbol VARCHAR(10) NOT NULL UNIQUE,
-                        notes TEXT,
-                        added_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        entry_price DECIMAL(10, 2),
-                        exit_price DECIMAL(10, 2),
-                        last_signal_type VARCHAR(10),
-                        signal_timestamp TIMESTAMP
-                    )
-                """)
-
-                # Add new table for trading decisions
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS trading_decisions (
-                        id SERIAL PRIMARY KEY,
-                        symbol VARCHAR(10) NOT NULL,
-                        decision TEXT NOT NULL,
-                        confidence FLOAT NOT NULL,
-                        agent_name VARCHAR(50) NOT NULL DEFAULT 'supervisor',
-                        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
-                    );
-                    CREATE UNIQUE INDEX IF NOT EXISTS trading_decisions_daily_idx 
-                    ON trading_decisions (symbol, date(created_at));
-                """)
-
-                self.conn.commit()
+                cur.execute(_SQL_LOCK_SCHEMA)
+                # Another worker may have migrated while we waited for the lock
+                cur.execute(_SQL_SCHEMA_VERSION_TABLE)
+                if cur.fetchone()[0] is not None:
+                    cur.execute(_SQL_SELECT_SCHEMA_VERSION)
+                    row = cur.fetchone()
+                else:
+                    row = None
+                if row and row[0] == SCHEMA_VERSION:
+                    Database._schema_ready = True
+                    return
+                for statement in SCHEMA:
+                    cur.execute(statement)
+                cur.execute(_SQL_SET_SCHEMA_VERSION, (SCHEMA_VERSION,))
             except Exception as e:
-                self.conn.rollback()
                 print(f"Error creating tables: {str(e)}")
                 raise
+        Database._schema_ready = True
+
+    def _schema_version(self):
+        try:
+            with self._cursor() as cur:
+                cur.execute(_SQL_SELECT_SCHEMA_VERSION)
+                row = cur.fetchone()
+        except psycopg2.errors.UndefinedTable:
+            return None
+        return row[0] if row else None
+
+    def reset_schema(self):
+        """Drop every table and sequence, losing all data, then recreate the schema"""
+        self.flush()
+        Database._schema_ready = False
+        with self._cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {', '.join(_SCHEMA_TABLES)} CASCADE")
+            cur.execute(f"DROP SEQUENCE IF EXISTS {', '.join(_SCHEMA_SEQUENCES)}")
+        self.create_tables()
+        self._clear_cache()
+
+    def add_position(self, symbol, quantity, entry_price, strategy, entry_date=None, cur=None) -> int:
+        """Open a position, entered now unless entry_date is given, and return its id"""
+        with self._writer(cur) as cur:
+            self._execute_prepared(
+                cur, 'add_position', _SQL_INSERT_POSITION, (symbol, quantity, entry_price, strategy, entry_date)
+            )
+            position_id = cur.fetchone()[0]
+        self._invalidate('portfolio')
+        return position_id
 
-    def add_position(self, symbol, quantity, entry_price, strategy):
-        with self.conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO portfolio (symbol, quantity, entry_price, entry_date, strategy)
-                VALUES (%s, %s, %s, %s, %s)
-                """, (symbol, quantity, entry_price, datetime.now(), strategy))
-            self.conn.commit()
-
-    def close_position(self, position_id, exit_price):
-        with self.conn.cursor() as cur:
-            cur.execute("""
-                UPDATE portfolio 
-                SET exit_price = %s, exit_date = %s
-                WHERE id = %s
-                """, (exit_price, datetime.now(), position_id))
-            self.conn.commit()
+    def close_position(self, position_id, exit_price, exit_date=None, cur=None):
+        with self._writer(cur) as cur:
+            self._execute_prepared(cur, 'close_position', _SQL_CLOSE_POSITION, (exit_price, exit_date, position_id))
+        self._invalidate('portfolio')
 
     def get_open_positions(self):
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT * FROM portfolio 
-                WHERE exit_date IS NULL
-                """)
-            return cur.fetchall()
+        def operation(cur):
+            self._execute_prepared(cur, 'select_open_positions', _SQL_SELECT_OPEN_POSITIONS, ())
+            return list(map(OpenPosition._make, cur.fetchall()))
+        return self._cached(('portfolio',), lambda: self.execute_with_retry(operation))
+
+    def iter_open_positions(self, chunk=1000):
+        """Stream get_open_positions rows without materializing the whole result"""
+        return self._stream(_SQL_SELECT_OPEN_POSITIONS, chunk=chunk, record=OpenPosition)
 
     def add_signal(self, symbol, signal_type, strategy, confidence):
-        with self.conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO trading_signals 
-                (symbol, signal_type, strategy, confidence, timestamp)
-                VALUES (%s, %s, %s, %s, %s)
-                """, (symbol, signal_type, strategy, confidence, datetime.now()))
-            self.conn.commit()
-
-    def upsert_screened_stock(self, symbol, company_name, current_price, average_volume):
-        with self.conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO screened_stocks 
-                (symbol, company_name, current_price, average_volume, last_updated)
-                VALUES (%s, %s, %s, %s, %s)
-                ON CONFLICT (symbol) 
-                DO UPDATE SET 
-                    company_name = EXCLUDED.company_name,
-                    current_price = EXCLUDED.current_price,
-                    average_volume = EXCLUDED.average_volume,
-                    last_updated = EXCLUDED.last_updated
-                """, (symbol, company_name, current_price, average_volume, datetime.now()))
-            self.conn.commit()
+        """Queue a signal; it is written by the next flush"""
+        self._enqueue(self._signal_buf, (symbol, signal_type, strategy, confidence))
+
+    def add_signals_bulk(self, rows, cur=None):
+        """Insert many (symbol, signal_type, strategy, confidence) rows in one batch and commit"""
+        with self._writer(cur) as cur:
+            execute_values(cur, _SQL_INSERT_SIGNALS, rows, page_size=500)
+
+    def upsert_screened_stock(self, symbol, company_name, current_price, average_volume, cur=None):
+        self.upsert_screened_stocks_bulk([(symbol, company_name, current_price, average_volume)], cur)
+
+    def upsert_screened_stocks_bulk(self, rows, cur=None):
+        """Upsert many (symbol, company_name, current_price, average_volume) rows in one transaction"""
+        if len(rows) >= self.COPY_THRESHOLD:
+            return self.bulk_load_screened_stocks(rows, cur)
+        # One multi-row statement can't touch a symbol twice, so the last row per symbol wins
+        latest = {row[0]: tuple(row) for row in rows}
+        with self._writer(cur) as cur:
+            execute_values(cur, _SQL_UPSERT_SCREENED_VALUES, list(latest.values()), page_size=500)
+        self._invalidate('screened_stocks')
+
+    def bulk_load_screened_stocks(self, rows, cur=None):
+        """upsert_screened_stocks_bulk for large refreshes: COPY into a temp table, then one upsert"""
+        buf = self._screened_csv(rows)
+        with self._writer(cur) as cur:
+            cur.execute(_SQL_CREATE_SCREENED_LOAD)
+            cur.copy_expert(_SQL_COPY_SCREENED_LOAD, buf)
+            cur.execute(_SQL_UPSERT_SCREENED_FROM_LOAD)
+        self._invalidate('screened_stocks')
 
     def get_screened_stocks(self):
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT * FROM screened_stocks 
-                ORDER BY symbol ASC
-                """)
-            return cur.fetchall()
+        def operation(cur):
+            cur.execute(_SQL_SELECT_SCREENED)
+            return list(map(ScreenedStock._make, cur.fetchall()))
+        return self._cached(('screened_stocks',), lambda: self.execute_with_retry(operation))
+
+    def iter_screened_stocks(self, chunk=1000):
+        """Stream get_screened_stocks rows without materializing the whole result"""
+        return self._stream(_SQL_SELECT_SCREENED, chunk=chunk, record=ScreenedStock)
 
-    def clear_old_screened_stocks(self, hours=24):
-        with self.conn.cursor() as cur:
-            cur.execute("""
-                DELETE FROM screened_stocks 
-                WHERE last_updated < NOW() - INTERVAL '%s hours'
-                """, (hours,))
-            self.conn.commit()
+    def clear_old_screened_stocks(self, hours=24, cur=None):
+        with self._writer(cur) as cur:
+            self._execute_prepared(cur, 'delete_old_screened', _SQL_DELETE_OLD_SCREENED, (int(hours),))
+        self._invalidate('screened_stocks')
 
-    def add_to_watchlist(self, symbol, notes=None, entry_price=None, exit_price=None):
+    def refresh_screened_stocks(self, rows, ttl_hours=24):
+        """One screener cycle in one transaction: purge stale rows, then upsert the fresh batch"""
+        with self.transaction() as cur:
+            self.clear_old_screened_stocks(ttl_hours, cur=cur)
+            self.upsert_screened_stocks_bulk(rows, cur=cur)
+
+    def replace_screened_stocks(self, rows, cur=None):
+        """A full screener refresh: empty the table, then COPY the batch in, in one transaction
+
+        TRUNCATE locks out readers until the commit, so they see the old rows or the new ones.
+        """
+        buf = self._screened_csv(rows)
+        with self._writer(cur) as cur:
+            cur.execute(_SQL_TRUNCATE_SCREENED)
+            cur.copy_expert(_SQL_COPY_SCREENED, buf)
+        self._invalidate('screened_stocks')
+
+    @staticmethod
+    def _screened_csv(rows):
+        """(symbol, company_name, current_price, average_volume) rows as CSV, the last row per symbol winning"""
+        latest = {row[0]: tuple(row) for row in rows}
+        buf = io.StringIO()
+        csv.writer(buf).writerows(latest.values())
+        buf.seek(0)
+        return buf
+
+    def add_to_watchlist(self, symbol, notes=None, entry_price=None, exit_price=None, cur=None):
         """Add or update a stock in the watchlist with optional entry/exit prices"""
-        with self.conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO watchlist_stocks (symbol, notes, entry_price, exit_price)
-                VALUES (%s, %s, %s, %s)
-                ON CONFLICT (symbol) DO UPDATE SET
-                    notes = EXCLUDED.notes,
-                    entry_price = EXCLUDED.entry_price,
-                    exit_price = EXCLUDED.exit_price,
-                    added_date = CURRENT_TIMESTAMP
-                """, (symbol.upper(), notes, entry_price, exit_price))
-            self.conn.commit()
-
-    def update_watchlist_signal(self, symbol, signal_type):
+        with self._writer(cur) as cur:
+            cur.execute(_SQL_UPSERT_WATCHLIST, (symbol.upper(), notes, entry_price, exit_price))
+        self._invalidate('watchlist')
+
+    def update_watchlist_signal(self, symbol, signal_type, cur=None):
         """Update the last signal type and timestamp for a watchlist stock"""
-        with self.conn.cursor() as cur:
-            cur.execute("""
-                UPDATE watchlist_stocks 
-                SET last_signal_type = %s,
-                    signal_timestamp = CURRENT_TIMESTAMP
-                WHERE symbol = %s
-                """, (signal_type, symbol.upper()))
-            self.conn.commit()
-
-    def remove_from_watchlist(self, symbol):
-        with self.conn.cursor() as cur:
-            cur.execute("""
-                DELETE FROM watchlist_stocks 
-                WHERE symbol = %s
-                """, (symbol.upper(),))
-            self.conn.commit()
+        with self._writer(cur) as cur:
+            self._execute_prepared(
+                cur, 'update_watchlist_signal', _SQL_UPDATE_WATCHLIST_SIGNAL, (signal_type, symbol.upper())
+            )
+        self._invalidate('watchlist')
+
+    def remove_from_watchlist(self, symbol, cur=None):
+        with self._writer(cur) as cur:
+            cur.execute(_SQL_DELETE_WATCHLIST, (symbol.upper(),))
+        self._invalidate('watchlist')
 
     def get_watchlist(self):
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT * FROM watchlist_stocks 
-                ORDER BY added_date DESC
-                """)
-            return cur.fetchall()
+        def operation(cur):
+            cur.execute(_SQL_SELECT_WATCHLIST)
+            return list(map(WatchlistStock._make, cur.fetchall()))
+        return self._cached(('watchlist',), lambda: self.execute_with_retry(operation))
+
+    def iter_watchlist(self, chunk=1000):
+        """Stream get_watchlist rows without materializing the whole result"""
+        return self._stream(_SQL_SELECT_WATCHLIST, chunk=chunk, record=WatchlistStock)
+
     def save_trading_decision(self, symbol: str, decision: str, confidence: float, agent_name: str = 'supervisor'):
-        """Save a new trading decision for a stock"""
-        with self.conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO trading_decisions (symbol, decision, confidence, agent_name)
-                VALUES (%s, %s, %s, %s)
-                """, (symbol, decision, confidence, agent_name))
-            self.conn.commit()
+        """Queue a new trading decision for a stock; it is written by the next flush"""
+        self._enqueue(self._decision_buf, (symbol, decision, confidence, agent_name))
+        self._invalidate('trading_decisions', symbol)
+
+    def save_trading_decisions_bulk(self, rows, cur=None):
+        """Write many (symbol, decision, confidence, agent_name) rows now, in one multi-row INSERT"""
+        # All rows share today's date, so the last one per symbol and agent wins
+        latest = {(row[0], row[3]): tuple(row) for row in rows}
+        # Queued decisions are older, so write them first rather than letting them overwrite these;
+        # transaction() already flushed for a caller's cursor
+        if cur is None:
+            self.flush()
+        with self._writer(cur) as cur:
+            execute_values(cur, _SQL_INSERT_DECISIONS, list(latest.values()), page_size=500)
+        for symbol, _ in latest:
+            self._invalidate('trading_decisions', symbol)
+
+    def record_decision_and_signal(self, symbol, decision, confidence, signal_type, strategy,
+                                   agent_name='supervisor', cur=None):
+        """Write a decision and its trading signal now, with one statement"""
+        if cur is None:
+            self.flush()
+        with self._writer(cur) as cur:
+            cur.execute(_SQL_INSERT_DECISION_AND_SIGNAL, {
+                'symbol': symbol, 'decision': decision, 'confidence': confidence,
+                'signal_type': signal_type, 'strategy': strategy, 'agent_name': agent_name
+            })
+        self._invalidate('trading_decisions', symbol)
 
     def get_latest_trading_decisions(self, symbol: str, limit: int = 2):
         """Get the latest trading decisions for a stock"""
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT decision, confidence, agent_name, created_at
-                FROM trading_decisions
-                WHERE symbol = %s
-                ORDER BY created_at DESC
-                LIMIT %s
-                """, (symbol, limit))
+        self.flush()
+        def operation(cur):
+            self._execute_prepared(cur, 'select_latest_decisions', _SQL_SELECT_LATEST_DECISIONS, (symbol, limit))
             return cur.fetchall()
+        return self._cached(('trading_decisions', symbol, 'latest', limit), lambda: self.execute_with_retry(operation, RealDictCursor))
 
     def get_all_agent_decisions(self, symbol: str):
         """Get the latest decision from each agent for a stock"""
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                WITH RankedDecisions AS (
-                    SELECT 
-                        symbol,
-                        decision,
-                        confidence,
-                        agent_name,
-                        created_at,
-                        ROW_NUMBER() OVER (PARTITION BY agent_name ORDER BY created_at DESC) as rn
-                    FROM trading_decisions
-                    WHERE symbol = %s
-                )
-                SELECT symbol, decision, confidence, agent_name, created_at
-                FROM RankedDecisions
-                WHERE rn = 1
-                ORDER BY agent_name;
-                """, (symbol,))
+        self.flush()
+        def operation(cur):
+            self._execute_prepared(cur, 'select_all_agent_decisions', _SQL_SELECT_ALL_AGENT_DECISIONS, (symbol,))
+            return cur.fetchall()
+        return self._cached(('trading_decisions', symbol, 'by_agent'), lambda: self.execute_with_retry(operation, RealDictCursor))
+
+    def get_latest_trading_decisions_bulk(self, symbols, limit: int = 2):
+        """get_latest_trading_decisions for many symbols in one query: {symbol: [decision, ...]}"""
+        self.flush()
+        def operation(cur):
+            cur.execute(_SQL_SELECT_LATEST_DECISIONS_BULK, (list(symbols), limit))
             return cur.fetchall()
+        return self._group_by_symbol(symbols, self.execute_with_retry(operation, RealDictCursor))
+
+    def get_agent_decisions_bulk(self, symbols, per_agent: int = 2):
+        """The latest per_agent decisions of every agent for many symbols: {symbol: [decision, ...]}
+
+        Rows are ordered by agent_name, newest first within each agent.
+        """
+        self.flush()
+        def operation(cur):
+            cur.execute(_SQL_SELECT_AGENT_DECISIONS_BULK, (list(symbols), per_agent))
+            return cur.fetchall()
+        return self._group_by_symbol(symbols, self.execute_with_retry(operation, RealDictCursor))
+
+    @staticmethod
+    def _group_by_symbol(symbols, rows):
+        grouped = {symbol: [] for symbol in symbols}
+        for row in rows:
+            grouped[row['symbol']].append(row)
+        return grouped
 
     def get_latest_position_id(self, symbol: str) -> int:
-        """Get the ID of the most recently added position for a symbol"""
-        with self.conn.cursor() as cur:
-            cur.execute("""
-                SELECT id FROM portfolio 
-                WHERE symbol = %s
-                ORDER BY entry_date DESC 
-                LIMIT 1
-                """, (symbol,))
+        """Get the ID of the most recently added position for a symbol
+
+        Deprecated: add_position returns the new ID, and this lookup races with concurrent inserts.
+        """
+        warnings.warn(
+            "get_latest_position_id is deprecated; use the ID returned by add_position",
+            DeprecationWarning, stacklevel=2
+        )
+        with self._cursor() as cur:
+            cur.execute(_SQL_SELECT_LATEST_POSITION_ID, (symbol,))
             result = cur.fetchone()
             return result[0] if result else None
\ No newline at end of file
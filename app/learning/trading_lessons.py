@@ -1,16 +1,16 @@
-from dataclasses import dataclass
-from typing import List, Dict
+from dataclasses import dataclass, replace
+from typing import List, Dict, NamedTuple, Tuple
 from datetime import datetime
 import pandas as pd
 
-@dataclass
+@dataclass(slots=True)
 class LessonProgress:
     completed: bool
     score: int
     completed_at: datetime
     attempts: int
 
-@dataclass
+@dataclass(slots=True)
 class Achievement:
     name: str
     description: str
@@ -18,6 +18,11 @@ class Achievement:
     unlocked: bool
     unlocked_at: datetime = None
 
+class QuizQuestion(NamedTuple):
+    question: str
+    options: Tuple[str, ...]
+    correct_answer: int
+
 class TradingLesson:
     def __init__(self, lesson_id: str, title: str, content: str, difficulty: str):
         self.lesson_id = lesson_id
@@ -27,25 +32,16 @@ class TradingLesson:
         self.quiz_questions = []
         
     def add_quiz_question(self, question: str, options: List[str], correct_answer: int):
-        self.quiz_questions.append({
-            'question': question,
-            'options': options,
-            'correct_answer': correct_answer
-        })
+        self.quiz_questions.append(QuizQuestion(question, tuple(options), correct_answer))
 
-class TradingEducation:
-    def __init__(self):
-        self.lessons = self._initialize_lessons()
-        self.achievements = self._initialize_achievements()
-        
-    def _initialize_lessons(self) -> Dict[str, TradingLesson]:
-        lessons = {}
-        
-        # MACD Strategy Lesson
-        macd = TradingLesson(
-            'macd_basics',
-            'Understanding MACD Strategy',
-            """
+def _build_lessons() -> Dict[str, TradingLesson]:
+    lessons = {}
+    
+    # MACD Strategy Lesson
+    macd = TradingLesson(
+        'macd_basics',
+        'Understanding MACD Strategy',
+        """
             The Moving Average Convergence Divergence (MACD) is a trend-following momentum indicator.
             Key concepts:
             1. MACD Line
@@ -53,25 +49,25 @@ class TradingEducation:
             3. MACD Histogram
             4. Trading Signals
             """,
-            'Beginner'
-        )
-        macd.add_quiz_question(
-            'What does MACD stand for?',
-            [
-                'Moving Average Convergence Divergence',
-                'Multiple Average Calculation Display',
-                'Market Analysis Chart Display',
-                'Moving Analysis Chart Divergence'
-            ],
-            0
-        )
-        lessons['macd_basics'] = macd
-        
-        # Bollinger Bands Lesson
-        bollinger = TradingLesson(
-            'bollinger_basics',
-            'Trading with Bollinger Bands',
-            """
+        'Beginner'
+    )
+    macd.add_quiz_question(
+        'What does MACD stand for?',
+        [
+            'Moving Average Convergence Divergence',
+            'Multiple Average Calculation Display',
+            'Market Analysis Chart Display',
+            'Moving Analysis Chart Divergence'
+        ],
+        0
+    )
+    lessons['macd_basics'] = macd
+    
+    # Bollinger Bands Lesson
+    bollinger = TradingLesson(
+        'bollinger_basics',
+        'Trading with Bollinger Bands',
+        """
             Bollinger Bands are volatility bands placed above and below a moving average.
             Key concepts:
             1. Middle Band (20-day SMA)
@@ -79,44 +75,54 @@ class TradingEducation:
             3. Lower Band (-2σ)
             4. Volatility Measurement
             """,
-            'Intermediate'
-        )
-        bollinger.add_quiz_question(
-            'What do Bollinger Bands measure?',
-            [
-                'Market Volatility',
-                'Only Price Direction',
-                'Trading Volume',
-                'Market Sentiment'
-            ],
-            0
-        )
-        lessons['bollinger_basics'] = bollinger
-        
-        return lessons
-    
-    def _initialize_achievements(self) -> Dict[str, Achievement]:
-        return {
-            'strategy_master': Achievement(
-                name='Strategy Master',
-                description='Complete all basic strategy lessons',
-                icon='🎓',
-                unlocked=False
-            ),
-            'quiz_ace': Achievement(
-                name='Quiz Ace',
-                description='Score 100% on any quiz',
-                icon='🌟',
-                unlocked=False
-            ),
-            'practice_pro': Achievement(
-                name='Practice Pro',
-                description='Complete 10 practice trades',
-                icon='💪',
-                unlocked=False
-            )
-        }
+        'Intermediate'
+    )
+    bollinger.add_quiz_question(
+        'What do Bollinger Bands measure?',
+        [
+            'Market Volatility',
+            'Only Price Direction',
+            'Trading Volume',
+            'Market Sentiment'
+        ],
+        0
+    )
+    lessons['bollinger_basics'] = bollinger
     
+    return lessons
+
+def _build_achievement_templates() -> Dict[str, Achievement]:
+    return {
+        'strategy_master': Achievement(
+            name='Strategy Master',
+            description='Complete all basic strategy lessons',
+            icon='🎓',
+            unlocked=False
+        ),
+        'quiz_ace': Achievement(
+            name='Quiz Ace',
+            description='Score 100% on any quiz',
+            icon='🌟',
+            unlocked=False
+        ),
+        'practice_pro': Achievement(
+            name='Practice Pro',
+            description='Complete 10 practice trades',
+            icon='💪',
+            unlocked=False
+        )
+    }
+
+# Lesson content is static, so it is built once at import and shared by every TradingEducation
+_LESSONS = _build_lessons()
+_ACHIEVEMENT_TEMPLATES = _build_achievement_templates()
+
+class TradingEducation:
+    def __init__(self):
+        self.lessons = _LESSONS
+        # Unlock state is per instance, so each gets its own copies
+        self.achievements = {key: replace(achievement) for key, achievement in _ACHIEVEMENT_TEMPLATES.items()}
+
     def get_lesson(self, lesson_id: str) -> TradingLesson:
         return self.lessons.get(lesson_id)
     
@@ -127,7 +133,7 @@ class TradingEducation:
         lesson = self.lessons.get(lesson_id)
         if not lesson or question_idx >= len(lesson.quiz_questions):
             return False
-        return lesson.quiz_questions[question_idx]['correct_answer'] == answer
+        return lesson.quiz_questions[question_idx].correct_answer == answer
     
     def get_achievements(self) -> List[Achievement]:
         return list(self.achievements.values())
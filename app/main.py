@@ -1,78 +1,146 @@
 import streamlit as st
+import asyncio
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-import yfinance as yf
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 from db.database import Database
 from data.market_data import MarketData
+from data.indicators import portfolio_pnl
 from strategies.macd_strategy import MACDStrategy
 from strategies.fibonacci_strategy import FibonacciStrategy
 from strategies.bollinger_strategy import BollingerStrategy
 from strategies.fractal_strategy import FractalStrategy
 from strategies.resistance_strategy import ResistanceStrategy
-from agents.trading_agents import TradingAgent
-from agents.market_trend_agents import MarketTrendAgent
+from agents.trading_agents import TradingAgent, analyze_all
+from agents.market_trend_agents import MarketTrendAgent, abatch_analyze_trends
 from agents.sentiment_agents import SentimentAgent
 from agents.supervisor_agent import SupervisorAgent
 from agents.resistance_agent import ResistanceAnalysisAgent
 from agents.recommendation_agent import StrategyRecommendationAgent # Added import
 from learning.trading_lessons import TradingEducation  # Add this import at the top
+from agents.llm import configure_llm_cache, iter_sync, run_sync
 
 
-# Initialize components
-db = Database()
-market_data = MarketData()
-
-# Initialize strategies and agents
-strategies = {
-    'MACD': MACDStrategy(),
-    'Fibonacci': FibonacciStrategy(),
-    'Bollinger': BollingerStrategy(),
-    'Fractal': FractalStrategy(),
-    'Resistance': ResistanceStrategy()  # Add the new resistance strategy
-}
-
-trading_agents = {
-    name: TradingAgent(strategy) for name, strategy in strategies.items()
-}
-
-market_trend_agents = {
-    timeframe: MarketTrendAgent(timeframe)
-    for timeframe in ['30d', '15d', '3d']
-}
-
-sentiment_agents = {
-    timeframe: SentimentAgent(timeframe)
-    for timeframe in ['30d', '15d', '3d']
-}
+@st.cache_resource
+def get_components():
+    """Build the database, market data and agents once per process; every rerun reuses them"""
+    configure_llm_cache()
 
-resistance_agent = ResistanceAnalysisAgent() # Added resistance agent initialization
-
-recommendation_agent = StrategyRecommendationAgent() # Added recommendation agent initialization
+    # Initialize strategies and agents
+    strategies = {
+        'MACD': MACDStrategy(),
+        'Fibonacci': FibonacciStrategy(),
+        'Bollinger': BollingerStrategy(),
+        'Fractal': FractalStrategy(),
+        'Resistance': ResistanceStrategy()  # Add the new resistance strategy
+    }
 
-supervisor = SupervisorAgent()
+    return {
+        'db': Database(),
+        'market_data': MarketData(),
+        'strategies': strategies,
+        'trading_agents': {
+            name: TradingAgent(strategy) for name, strategy in strategies.items()
+        },
+        'market_trend_agents': {
+            timeframe: MarketTrendAgent(timeframe)
+            for timeframe in ['30d', '15d', '3d']
+        },
+        'sentiment_agents': {
+            timeframe: SentimentAgent(timeframe)
+            for timeframe in ['30d', '15d', '3d']
+        },
+        'resistance_agent': ResistanceAnalysisAgent(),
+        'recommendation_agent': StrategyRecommendationAgent(),
+        'supervisor': SupervisorAgent()
+    }
 
-# Initialize education module (add this after other initializations)
-education = TradingEducation()
+# Initialize components
+components = get_components()
+db = components['db']
+market_data = components['market_data']
+strategies = components['strategies']
+trading_agents = components['trading_agents']
+market_trend_agents = components['market_trend_agents']
+sentiment_agents = components['sentiment_agents']
+resistance_agent = components['resistance_agent']
+recommendation_agent = components['recommendation_agent']
+supervisor = components['supervisor']
+
+# Lesson progress and achievements belong to the user, so keep them in the session
+if 'education' not in st.session_state:
+    st.session_state.education = TradingEducation()
+education = st.session_state.education
+
+# Streamlit reruns this script on every interaction, so memoize quotes across reruns
+@st.cache_data(ttl=60, show_spinner=False)
+def cached_stock_data(symbol, period='1mo'):
+    """market_data.get_stock_data, shared by every rerun for a minute"""
+    return market_data.get_stock_data(symbol, period=period)
+
+@st.cache_data(ttl=60, show_spinner=False)
+def cached_indicator_data(symbol, period='1mo'):
+    """cached_stock_data with the technical indicators added"""
+    return market_data.calculate_technical_indicators(cached_stock_data(symbol, period))
+
+@st.cache_data(ttl=60, show_spinner=False)
+def cached_price_chart(symbol, period='1mo'):
+    """Candlestick and Bollinger Band chart as a Plotly dict, so reruns skip building and validating the figure"""
+    data = cached_indicator_data(symbol, period)
+    return go.Figure(data=[
+        # Candlestick chart
+        go.Candlestick(
+            x=data.index,
+            open=data['Open'],
+            high=data['High'],
+            low=data['Low'],
+            close=data['Close'],
+            name='OHLC'
+        ),
+        # Bollinger Bands
+        go.Scatter(
+            x=data.index,
+            y=data['Upper_Band'],
+            name='Upper Band',
+            line=dict(color='gray', dash='dash')
+        ),
+        go.Scatter(
+            x=data.index,
+            y=data['Lower_Band'],
+            name='Lower Band',
+            line=dict(color='gray', dash='dash'),
+            fill='tonexty'
+        )
+    ]).to_dict()
+
+@st.cache_data(ttl=60, show_spinner=False)
+def cached_stock_data_many(symbols, period='1mo'):
+    """{symbol: DataFrame} for many symbols from one batched download; a symbol without data maps to an empty frame"""
+    return market_data.get_many(list(symbols), period=period)
+
+@st.cache_data(ttl=60, show_spinner=False)
+def cached_latest_closes(symbols, period='5d'):
+    """{symbol: last close} for many symbols from one batched download; symbols without data are left out"""
+    frames = cached_stock_data_many(symbols, period)
+    return {symbol: data['Close'].iloc[-1] for symbol, data in frames.items() if not data.empty}
+
+async def gather_agent_analyses(symbol, data):
+    """Strategy signals, trend and sentiment analyses for one symbol, all requested concurrently"""
+    signals, trend_analysis, sentiments = await asyncio.gather(
+        analyze_all(trading_agents, {symbol: data}),
+        abatch_analyze_trends(market_trend_agents, data, symbol=symbol),
+        asyncio.gather(*(agent.aanalyze_sentiment(symbol) for agent in sentiment_agents.values()))
+    )
+    return signals[symbol], trend_analysis, dict(zip(sentiment_agents, sentiments))
 
 def analyze_trading_signals(data):
     """Analyze trading signals for the given data"""
-    signals = {
-        name: agent.analyze(data)
-        for name, agent in trading_agents.items()
-    }
-
-    trend_analysis = {
-        timeframe: agent.analyze_trend(data)
-        for timeframe, agent in market_trend_agents.items()
-    }
-
-    sentiment_analysis = {
-        timeframe: agent.analyze_sentiment(st.session_state.symbol)
-        for timeframe, agent in sentiment_agents.items()
-    }
+    # Every strategy, trend and sentiment agent queries the LLM at once; total time is the slowest one
+    symbol = st.session_state.symbol
+    signals, trend_analysis, sentiment_analysis = run_sync(gather_agent_analyses(symbol, data))
 
     # Add resistance analysis for each strategy's entry/exit points
     resistance_analysis = {}
@@ -105,9 +173,25 @@ def analyze_trading_signals(data):
         print(f"Error in resistance analysis block: {str(e)}")
         st.error(f"Error in resistance analysis block: {str(e)}")
 
-    decision = supervisor.make_decision(signals, trend_analysis, sentiment_analysis, resistance_analysis)
+    decision = stream_supervisor_decision(signals, trend_analysis, sentiment_analysis, resistance_analysis)
     return signals, trend_analysis, sentiment_analysis, resistance_analysis, decision
 
+def stream_supervisor_decision(signals, trend_analysis, sentiment_analysis, resistance_analysis):
+    """Show the supervisor's answer as it is generated and return the parsed decision"""
+    decision = {}
+
+    def tokens():
+        events = supervisor.astream_decision(signals, trend_analysis, sentiment_analysis, resistance_analysis)
+        for event in iter_sync(events):
+            if event['type'] == 'token':
+                yield event['content']
+            elif event['type'] == 'decision':
+                decision.update(event['decision'])
+
+    with st.expander("Supervisor reasoning", expanded=True):
+        st.write_stream(tokens())
+    return decision
+
 def calculate_trade_points(data):
     """Calculate entry and exit points based on technical indicators"""
     try:
@@ -139,7 +223,7 @@ def get_agent_decisions(symbol, data):
 
     # Get trading signals from each strategy agent
     for name, agent in trading_agents.items():
-        signals = agent.analyze(data)
+        signals = agent.analyze(data, symbol)
         action = 'BUY' if signals.get('buy', False) else 'SELL' if signals.get('sell', False) else 'HOLD'
         agent_decisions[name] = {
             'action': action,
@@ -158,71 +242,64 @@ def extract_trading_action(decision_text):
     return 'HOLD'
 
 def analyze_watchlist_stock(symbol, data):
-    """Analyze a single watchlist stock using our AI agents"""
-    signals = {}
-
-    try:
-        # Ensure technical indicators are calculated
+    """Analyze a single watchlist stock using our AI agents
+
+    Makes no Streamlit calls and lets errors propagate, so several stocks can be analyzed
+    on worker threads at once.
+    """
+    # Every agent's decision, written in one batch once the supervisor has decided
+    decisions = []
+    # The last BUY/SELL from the strategy agents, applied to the watchlist in the same batch
+    watchlist_signal = None
+    bought = False
+
+    # Ensure technical indicators are calculated
+    if 'Upper_Band' not in data.columns:
         data = market_data.calculate_technical_indicators(data)
 
-        # Calculate entry and exit points
-        entry_point, exit_point = calculate_trade_points(data)
-
-        # Create a placeholder for progress
-        progress_placeholder = st.empty()
-
-        # Show trading agents analysis progress
-        progress_placeholder.write("🤖 Trading Agents Analysis:")
-        for name, agent in trading_agents.items():
-            progress_placeholder.write(f"  ↳ {name} Strategy Agent analyzing {symbol}...")
-            signals[name] = agent.analyze(data)
-            # Save each agent's decision
-            action = 'BUY' if signals[name].get('buy', False) else 'SELL' if signals[name].get('sell', False) else 'HOLD'
-            db.save_trading_decision(symbol, action, signals[name].get('confidence', 0.0), f"strategy_{name.lower()}")
-
-            # Update watchlist with entry/exit points if it's a buy signal
-            if signals[name].get('buy', False):
-                db.add_to_watchlist(symbol, entry_price=entry_point, exit_price=exit_point)
-                db.update_watchlist_signal(symbol, 'BUY')
-            elif signals[name].get('sell', False):
-                db.update_watchlist_signal(symbol, 'SELL')
-
-        # Show market trend analysis progress
-        progress_placeholder.write("📈 Market Trend Analysis:")
-        trend_analysis = {}
-        for timeframe, agent in market_trend_agents.items():
-            progress_placeholder.write(f"  ↳ {timeframe} Trend Agent analyzing market conditions...")
-            trend_analysis[timeframe] = agent.analyze_trend(data)
-            # Save trend analysis
-            db.save_trading_decision(symbol, trend_analysis[timeframe]['analysis'], 
-                                       0.8, f"trend_{timeframe}")
-
-        # Show sentiment analysis progress
-        progress_placeholder.write("📰 Sentiment Analysis:")
-        sentiment_analysis = {}
-        for timeframe, agent in sentiment_agents.items():
-            progress_placeholder.write(f"  ↳ {timeframe} Sentiment Agent analyzing news and social media...")
-            sentiment_analysis[timeframe] = agent.analyze_sentiment(symbol)
-            # Save sentiment analysis
-            db.save_trading_decision(symbol, sentiment_analysis[timeframe]['analysis'], 
-                                       0.7, f"sentiment_{timeframe}")
-
-        # Show supervisor decision making
-        progress_placeholder.write("🎯 Supervisor Agent making final decision...")
-        decision = supervisor.make_decision(signals, trend_analysis, sentiment_analysis)
-
-        # Save supervisor decision with explicit decision text
-        supervisor_action = extract_trading_action(decision['decision'])
-        supervisor_decision = f"{supervisor_action} - {decision['decision'][:100]}..."  # Include first 100 chars of analysis
-        db.save_trading_decision(symbol, supervisor_decision, 0.9, 'supervisor')
-
-        # Clear the progress display
-        progress_placeholder.empty()
-
-        return supervisor_decision, 0.9
-    except Exception as e:
-        st.error(f"Error analyzing {symbol}: {str(e)}")
-        return "HOLD - Analysis Error", 0.0
+    # Calculate entry and exit points
+    entry_point, exit_point = calculate_trade_points(data)
+
+    # One LCEL graph: every strategy, trend and sentiment agent runs at once, then the supervisor decides
+    signals, trend_analysis, sentiment_analysis, decision = run_sync(supervisor.arun_pipeline(
+        symbol, data, None, market_trend_agents, sentiment_agents, trading_agents=trading_agents
+    ))
+
+    for name in signals:
+        # Record each agent's decision
+        action = 'BUY' if signals[name].get('buy', False) else 'SELL' if signals[name].get('sell', False) else 'HOLD'
+        decisions.append((symbol, action, signals[name].get('confidence', 0.0), f"strategy_{name.lower()}"))
+
+        # Update watchlist with entry/exit points if it's a buy signal
+        if signals[name].get('buy', False):
+            bought = True
+            watchlist_signal = 'BUY'
+        elif signals[name].get('sell', False):
+            watchlist_signal = 'SELL'
+
+    for timeframe in trend_analysis:
+        # Record trend analysis
+        decisions.append((symbol, trend_analysis[timeframe]['analysis'], 0.8, f"trend_{timeframe}"))
+
+    for timeframe in sentiment_analysis:
+        # Record sentiment analysis
+        decisions.append((symbol, sentiment_analysis[timeframe]['analysis'], 0.7, f"sentiment_{timeframe}"))
+
+    # Save supervisor decision with explicit decision text
+    supervisor_action = extract_trading_action(decision['decision'])
+    supervisor_decision = f"{supervisor_action} - {decision['decision'][:100]}..."  # Include first 100 chars of analysis
+    # The supervisor returns its parsed confidence alongside the decision text, or None if the model gave none
+    confidence = 0.5 if decision['confidence'] is None else decision['confidence']
+    with db.transaction() as cur:
+        if bought:
+            db.add_to_watchlist(symbol, entry_price=entry_point, exit_price=exit_point, cur=cur)
+        if watchlist_signal:
+            db.update_watchlist_signal(symbol, watchlist_signal, cur=cur)
+        db.save_trading_decisions_bulk(decisions, cur=cur)
+        # The supervisor decision and its signal go in one statement
+        db.record_decision_and_signal(symbol, supervisor_decision, confidence, supervisor_action, 'supervisor', cur=cur)
+
+    return supervisor_decision, confidence
 
 # Streamlit UI
 st.title("AI Hedge Fund Dashboard")
@@ -254,38 +331,8 @@ with tab1:
 
     with col1:
         st.subheader("Price Chart")
-        data = market_data.get_stock_data(st.session_state.symbol)
-        data = market_data.calculate_technical_indicators(data)
-
-        fig = go.Figure()
-
-        # Candlestick chart
-        fig.add_trace(go.Candlestick(
-            x=data.index,
-            open=data['Open'],
-            high=data['High'],
-            low=data['Low'],
-            close=data['Close'],
-            name='OHLC'
-        ))
-
-        # Bollinger Bands
-        fig.add_trace(go.Scatter(
-            x=data.index,
-            y=data['Upper_Band'],
-            name='Upper Band',
-            line=dict(color='gray', dash='dash')
-        ))
-
-        fig.add_trace(go.Scatter(
-            x=data.index,
-            y=data['Lower_Band'],
-            name='Lower Band',
-            line=dict(color='gray', dash='dash'),
-            fill='tonexty'
-        ))
-
-        st.plotly_chart(fig)
+        data = cached_indicator_data(st.session_state.symbol)
+        st.plotly_chart(cached_price_chart(st.session_state.symbol))
 
     # Only analyze signals when the button is clicked
     if analyze_button:
@@ -299,11 +346,14 @@ with tab1:
     with col2:
         st.subheader("Trading Signals")
         if st.session_state.signals:
+            # One markdown element per strategy instead of four
             for strategy, signal in st.session_state.signals.items():
-                st.write(f"**{strategy}**")
-                st.write(f"Signal: {'Buy' if signal['buy'] else 'Sell' if signal['sell'] else 'Hold'}")
-                st.write(f"Confidence: {signal['confidence']:.2f}")
-                st.write("---")
+                st.markdown(
+                    f"**{strategy}**\n\n"
+                    f"Signal: {'Buy' if signal['buy'] else 'Sell' if signal['sell'] else 'Hold'}\n\n"
+                    f"Confidence: {signal['confidence']:.2f}\n\n"
+                    "---"
+                )
         else:
             st.info("Click 'Analyze Trading Signals' to view signals")
 
@@ -352,16 +402,17 @@ with tab1:
             st.markdown("### Analysis Details")
             st.write("Based on:")
             if st.session_state.signals:
-                strategies = [name for name, signal in st.session_state.signals.items() 
+                signalled_strategies = [name for name, signal in st.session_state.signals.items() 
                             if signal.get('buy', False) or signal.get('sell', False)]
-                st.write(f"- Trading Signals: {', '.join(strategies)}")
+                st.write(f"- Trading Signals: {', '.join(signalled_strategies)}")
 
             if st.session_state.resistance_analysis:
                 resistance_checks = [f"{strategy} ({analysis['recommendation']})" 
                                   for strategy, analysis in st.session_state.resistance_analysis.items()]
                 st.write(f"- Resistance Analysis: {', '.join(resistance_checks)}")
 
-            st.write(f"Confidence: {st.session_state.decision.get('confidence', 0.0):.2f}")
+            confidence = st.session_state.decision.get('confidence')
+            st.write(f"Confidence: {'N/A' if confidence is None else f'{confidence:.2f}'}")
     else:
         st.info("Click 'Analyze Trading Signals' to view trading decision")
 
@@ -376,30 +427,38 @@ with tab2:
             progress_bar = st.progress(0)
             watchlist = db.get_watchlist()
 
-            for i, stock in enumerate(watchlist):
-                try:
-                    # Create an expander for each stock's analysis process
-                    with st.expander(f"Analyzing {stock['symbol']}", expanded=True):
-                        st.write(f"🔄 Processing {stock['symbol']}...")
-
-                        # Get previous decisions before updating
-                        previous_decisions = db.get_all_agent_decisions(stock['symbol'])
-
-                        stock_data = market_data.get_stock_data(stock['symbol'], period='5d')
-                        if not stock_data.empty and len(stock_data) >= 2:
-                            stock_data = market_data.calculate_technical_indicators(stock_data)
-                            decision_text, confidence = analyze_watchlist_stock(stock['symbol'], stock_data)
-                            db.save_trading_decision(stock['symbol'], decision_text, confidence)
-                            st.write(f"✅ Analysis completed for {stock['symbol']}")
-                        else:
-                            st.error(f"Insufficient data for {stock['symbol']}")
+            # Create an expander for each stock's analysis process, filled in as its result arrives
+            expanders = {}
+            stock_data_by_symbol = {}
+            for stock in watchlist:
+                expanders[stock.symbol] = st.expander(f"Analyzing {stock.symbol}", expanded=True)
+                stock_data = cached_indicator_data(stock.symbol, period='5d')
+                if not stock_data.empty and len(stock_data) >= 2:
+                    expanders[stock.symbol].write(f"🔄 Processing {stock.symbol}...")
+                    stock_data_by_symbol[stock.symbol] = stock_data
+                else:
+                    expanders[stock.symbol].error(f"Insufficient data for {stock.symbol}")
+
+            # Stocks are analyzed on worker threads; Streamlit and the progress bar are only touched here
+            completed = len(watchlist) - len(stock_data_by_symbol)
+            with ThreadPoolExecutor(max_workers=max(1, min(8, len(stock_data_by_symbol)))) as executor:
+                futures = {
+                    executor.submit(analyze_watchlist_stock, symbol, stock_data): symbol
+                    for symbol, stock_data in stock_data_by_symbol.items()
+                }
+                for future in as_completed(futures):
+                    symbol = futures[future]
+                    with expanders[symbol]:
+                        try:
+                            # The decision and its signal were saved by analyze_watchlist_stock
+                            future.result()
+                            st.write(f"✅ Analysis completed for {symbol}")
+                        except Exception as e:
+                            st.error(f"Error updating recommendations for {symbol}: {str(e)}")
 
                     # Update progress bar
-                    progress = (i + 1) / len(watchlist)
-                    progress_bar.progress(progress)
-
-                except Exception as e:
-                    st.error(f"Error updating recommendations for {stock['symbol']}: {str(e)}")
+                    completed += 1
+                    progress_bar.progress(completed / len(watchlist))
 
             progress_bar.empty()  # Clear the progress bar
             st.success("Trading recommendations updated!")
@@ -411,19 +470,19 @@ with tab2:
     if st.button("Add to Watchlist") and new_symbol:
         try:
             # Get current stock data
-            stock_data = market_data.get_stock_data(new_symbol)
+            stock_data = cached_stock_data(new_symbol)
             if not stock_data.empty:
                 current_price = stock_data['Close'].iloc[-1]
                 avg_volume = stock_data['Volume'].mean()
 
                 # Get company name
-                ticker = yf.Ticker(new_symbol)
-                company_name = ticker.info.get('longName', new_symbol)
+                company_name = market_data.get_company_name(new_symbol)
 
-                # Save to watchlist
-                db.add_to_watchlist(new_symbol, notes)
-                # Update screened stocks table
-                db.upsert_screened_stock(new_symbol, company_name, current_price, avg_volume)
+                with db.transaction() as cur:
+                    # Save to watchlist
+                    db.add_to_watchlist(new_symbol, notes, cur=cur)
+                    # Update screened stocks table
+                    db.upsert_screened_stock(new_symbol, company_name, current_price, avg_volume, cur=cur)
                 st.success(f"Added {new_symbol} to watchlist")
             else:
                 st.error(f"Could not fetch data for {new_symbol}")
@@ -434,10 +493,16 @@ with tab2:
     watchlist = db.get_watchlist()
     if watchlist:
         st.write("Your Watchlist:")
+        # The two most recent decisions of every agent, for the whole watchlist in one query
+        decisions_by_symbol = db.get_agent_decisions_bulk([stock.symbol for stock in watchlist], per_agent=2)
+        # Quotes for the whole watchlist in one batched download (5d to ensure we have enough data)
+        watchlist_data = cached_stock_data_many(tuple(stock.symbol for stock in watchlist), period='5d')
         for stock in watchlist:
             try:
-                # Get current stock data (using 5d to ensure we have enough data)
-                stock_data = market_data.get_stock_data(stock['symbol'], period='5d')
+                stock_data = watchlist_data[stock.symbol]
+                if stock_data.empty:
+                    # The batch can miss a ticker; retry it on its own
+                    stock_data = cached_stock_data(stock.symbol, period='5d')
                 if not stock_data.empty and len(stock_data) >= 2:
                     today_price = stock_data['Close'].iloc[-1]
                     yesterday_price = stock_data['Close'].iloc[-2]
@@ -449,24 +514,28 @@ with tab2:
                     col1, col2, col3 = st.columns([2, 2, 3])
 
                     with col1:
-                        st.write(f"**{stock['symbol']}**")
-                        if stock['notes']:
-                            st.write(stock['notes'])
+                        st.write(f"**{stock.symbol}**")
+                        if stock.notes:
+                            st.write(stock.notes)
 
                     with col2:
-                        st.write(f"Price: ${today_price:.2f}")
+                        # One markdown element for the whole column; \$ keeps the prices from being read as LaTeX
                         color = "green" if price_change >= 0 else "red"
-                        st.markdown(f"Change: <span style='color:{color}'>${price_change:.2f} ({price_change_pct:.1f}%)</span>", unsafe_allow_html=True)
-                        st.write(f"Volume: {volume:,.0f}")
+                        lines = [
+                            f"Price: \\${today_price:.2f}",
+                            f"Change: <span style='color:{color}'>\\${price_change:.2f} ({price_change_pct:.1f}%)</span>",
+                            f"Volume: {volume:,.0f}"
+                        ]
 
                         # Add entry/exit points display
-                        if stock['entry_price']:
-                            st.write(f"Entry Point: ${stock['entry_price']:.2f}")
-                        if stock['exit_price']:
-                            st.write(f"Exit Point: ${stock['exit_price']:.2f}")
-                        if stock['last_signal_type']:
-                            signal_color = "green" if stock['last_signal_type'] == 'BUY' else "red"
-                            st.markdown(f"Signal: <span style='color:{signal_color}'>{stock['last_signal_type']}</span>", unsafe_allow_html=True)
+                        if stock.entry_price:
+                            lines.append(f"Entry Point: \\${stock.entry_price:.2f}")
+                        if stock.exit_price:
+                            lines.append(f"Exit Point: \\${stock.exit_price:.2f}")
+                        if stock.last_signal_type:
+                            signal_color = "green" if stock.last_signal_type == 'BUY' else "red"
+                            lines.append(f"Signal: <span style='color:{signal_color}'>{stock.last_signal_type}</span>")
+                        st.markdown("<br>".join(lines), unsafe_allow_html=True)
 
 
                     with col3:
@@ -475,7 +544,7 @@ with tab2:
                         decisions_df = pd.DataFrame(columns=['Agent', 'Previous Decision', 'Current Decision'])
 
                         # Get the two most recent decisions for each agent
-                        agent_decisions = db.get_all_agent_decisions(stock['symbol'])
+                        agent_decisions = decisions_by_symbol[stock.symbol]
                         for agent_name in set(d['agent_name'] for d in agent_decisions):
                             agent_specific_decisions = [d for d in agent_decisions if d['agent_name'] == agent_name]
                             agent_specific_decisions.sort(key=lambda x: x['created_at'], reverse=True)
@@ -517,15 +586,15 @@ with tab2:
                         else:
                             st.write("No supervisor decision available yet. Click 'Update All Trading Recommendations' to analyze.")
 
-                    if st.button("Remove", key=f"remove_{stock['symbol']}"):
-                        db.remove_from_watchlist(stock['symbol'])
+                    if st.button("Remove", key=f"remove_{stock.symbol}"):
+                        db.remove_from_watchlist(stock.symbol)
                         st.experimental_rerun()
 
                     st.write("---")
                 else:
-                    st.error(f"Insufficient data for {stock['symbol']}")
+                    st.error(f"Insufficient data for {stock.symbol}")
             except Exception as e:
-                st.error(f"Error fetching data for {stock['symbol']}: {str(e)}")
+                st.error(f"Error fetching data for {stock.symbol}: {str(e)}")
     else:
         st.info("Your watchlist is empty. Add symbols above.")
 
@@ -560,7 +629,7 @@ with tab3:
             else:
                 # Show current gain/loss based on market price
                 try:
-                    current_price = market_data.get_stock_data(new_symbol)['Close'].iloc[-1]
+                    current_price = cached_stock_data(new_symbol)['Close'].iloc[-1]
                     gain_loss = (current_price - entry_price) * quantity
                     gain_loss_pct = ((current_price - entry_price) / entry_price) * 100
                     st.metric("Unrealized Gain/Loss", 
@@ -573,19 +642,20 @@ with tab3:
             if new_symbol and entry_price > 0 and quantity > 0:
                 try:
                     # Validate the symbol
-                    stock_data = market_data.get_stock_data(new_symbol)
+                    stock_data = cached_stock_data(new_symbol)
                     if not stock_data.empty:
-                        # Add position to database
-                        db.add_position(
-                            symbol=new_symbol,
-                            quantity=quantity,
-                            entry_price=entry_price,
-                            entry_date=entry_date, #Added entry date
-                            strategy=strategy,
-                            exit_price=exit_price, #Added exit price
-                            exit_date=exit_date #Added exit date
-
-                        )
+                        # Add position to database, closing it right away when an exit was entered
+                        with db.transaction() as cur:
+                            position_id = db.add_position(
+                                symbol=new_symbol,
+                                quantity=quantity,
+                                entry_price=entry_price,
+                                strategy=strategy,
+                                entry_date=entry_date,
+                                cur=cur
+                            )
+                            if exit_price > 0:
+                                db.close_position(position_id, exit_price, exit_date, cur=cur)
                         st.success(f"Added position for {new_symbol}")
                         st.experimental_rerun()
                     else:
@@ -599,26 +669,24 @@ with tab3:
     positions = db.get_open_positions()
     if positions:
         # Calculate current prices first so it's available for both sections
-        current_prices = {
-            pos['symbol']: market_data.get_stock_data(pos['symbol'])['Close'].iloc[-1]
-            for pos in positions
-        }
+        df = pd.DataFrame(positions)
+        current_prices = cached_latest_closes(tuple(df['symbol'].unique()))
 
         # Display positions table
-        df = pd.DataFrame(positions)
         st.dataframe(df)
 
-        # Calculate total P&L
-        total_pnl = sum(
-            (current_prices[pos['symbol']] - pos['entry_price']) * pos['quantity']
-            for pos in positions
+        # Calculate total P&L in one compiled pass; a symbol without a quote contributes nothing
+        total_pnl = portfolio_pnl(
+            df['symbol'].map(current_prices).to_numpy(dtype=np.float64),
+            df['entry_price'].to_numpy(dtype=np.float64),
+            df['quantity'].to_numpy(dtype=np.float64)
         )
 
         st.metric("Total P&L", f"${total_pnl:,.2f}")
 
         # Portfolio Composition
         st.subheader("Portfolio Composition")
-        composition = pd.DataFrame(positions).groupby('symbol').agg({
+        composition = df.groupby('symbol').agg({
             'quantity': 'sum',
             'entry_price': 'mean'
         }).reset_index()
@@ -729,7 +797,7 @@ with tab3:
 
             # Get market data for analysis
             symbol = st.session_state.symbol if 'symbol' in st.session_state else 'SPY'
-            market_data = market_data.get_stock_data(symbol)
+            symbol_data = cached_stock_data(symbol)
 
             # Get trading history from database
             trading_history = pd.DataFrame(db.get_open_positions())
@@ -750,14 +818,14 @@ with tab3:
             # Generate recommendations
             recommendations = recommendation_agent.recommend_strategies(
                 user_profile,
-                market_data,
+                symbol_data,
                 strategy_performance
             )
 
             # Display recommendations in a well-formatted way
             st.markdown("### 📊 Personalized Strategy Recommendations")
             st.markdown(recommendations['recommendations'])
-            st.markdown(f"*Last updated: {recommendations['timestamp'].strftime('%Y-%m-%d %H:%M')}*")
+            st.markdown(f"*Last updated: {recommendations['timestamp'].astimezone().strftime('%Y-%m-%d %H:%M')}*")
 
             # Add a quick-start guide
             st.markdown("### 🚀 Quick Start Guide")
@@ -794,13 +862,13 @@ with tab4:
             st.subheader("📝 Knowledge Check")
             for i, quiz in enumerate(lesson.quiz_questions):
                 answer = st.radio(
-                    f"Question {i+1}: {quiz['question']}",
-                    options=quiz['options'],
+                    f"Question {i+1}: {quiz.question}",
+                    options=quiz.options,
                     key=f"quiz_{selected_lesson}_{i}"
                 )
 
                 if st.button(f"Check Answer #{i+1}", key=f"check_{selected_lesson}_{i}"):
-                    selectedindex = quiz['options'].index(answer)
+                    selectedindex = quiz.options.index(answer)
                     if education.check_quiz_answer(selected_lesson, i, selectedindex):
                         st.success("Correct! 🎉")
                         # Check if user should earn an achievement